@@ -0,0 +1,63 @@
+"""
+Measure startup time of the YouTube Reporting API client.
+
+Compares building the service from the discovery document pinned in the repository (what Client does)
+with googleapiclient build() using the document bundled in the library and, optionally, the document
+fetched from the discovery service.
+
+Usage:
+    python scripts/benchmark_client_startup.py [--repeats N] [--network]
+"""
+
+import argparse
+import statistics
+import sys
+import time
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parent.parent / "src"))
+
+from google.oauth2.credentials import Credentials  # noqa: E402
+from googleapiclient.discovery import build, build_from_document  # noqa: E402
+
+from google_yt import client  # noqa: E402
+
+
+def pinned_document():
+    client.load_discovery_document.cache_clear()
+    return build_from_document(client.load_discovery_document(), credentials=Credentials(token="token"))
+
+
+def library_document():
+    return build(client.API_SERVICE_NAME, client.API_VERSION, credentials=Credentials(token="token"))
+
+
+def discovery_service():
+    return build(
+        client.API_SERVICE_NAME,
+        client.API_VERSION,
+        credentials=Credentials(token="token"),
+        static_discovery=False,
+        cache_discovery=False,
+    )
+
+
+def measure(name: str, func, repeats: int):
+    timings = []
+    for _ in range(repeats):
+        started = time.perf_counter()
+        func()
+        timings.append((time.perf_counter() - started) * 1000)
+    print(f"{name:<28} median {statistics.median(timings):8.2f} ms   max {max(timings):8.2f} ms")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeats", type=int, default=20)
+    parser.add_argument("--network", action="store_true", help="include discovery document fetched over network")
+    args = parser.parse_args()
+
+    measure("pinned document", pinned_document, args.repeats)
+    measure("library build()", library_document, args.repeats)
+    if args.network:
+        measure("discovery service (network)", discovery_service, min(args.repeats, 5))
@@ -0,0 +1,83 @@
+"""
+Base types of output table columns.
+
+Storage does not have to infer types of the loaded data when the manifest declares them. Candidate types
+are derived from the report_types registry: dimensions are strings, metrics are integers or numbers by their
+meaning (rates, percentages, averages, durations and money are fractional). The date dimension is a string
+as well - reports format dates as YYYYMMDD, which is not a date of storage, and the values are kept as they are
+(they are part of the primary key of existing tables).
+A fast check of the first rows (SAMPLE_BYTES) of each slice confirms the candidate types; a column whose
+sampled values do not match its candidate type falls back to a more general type. Rows beyond the sample
+are not checked.
+"""
+
+import csv
+import io
+import re
+
+from keboola.component.dao import BaseType, ColumnDefinition, SupportedDataTypes
+
+from report_types import report_types
+
+INTEGER = SupportedDataTypes.INTEGER.value
+NUMERIC = SupportedDataTypes.NUMERIC.value
+STRING = SupportedDataTypes.STRING.value
+# Amount of slice data checked for each report
+SAMPLE_BYTES = 64 * 1024
+# Parts of names of metrics with fractional values
+FRACTIONAL_METRIC_MARKERS = ("rate", "percentage", "average", "minutes", "revenue", "cpm")
+# More general type accepting values of both types
+_GENERALIZATION = {frozenset((INTEGER, NUMERIC)): NUMERIC}
+
+_INTEGER_PATTERN = re.compile(r"-?\d+")
+_NUMERIC_PATTERN = re.compile(r"-?(\d+\.?\d*|\.\d+)([eE][-+]?\d+)?")
+_PATTERNS = {INTEGER: _INTEGER_PATTERN, NUMERIC: _NUMERIC_PATTERN}
+# Type to try when values do not match a candidate type
+_FALLBACK = {INTEGER: NUMERIC, NUMERIC: STRING}
+
+
+def candidate_types(report_type_id: str) -> dict:
+    """Candidate base types of known columns of a report type"""
+    report_type = report_types.get(report_type_id, {"dimensions": [], "metrics": []})
+    types = {column: STRING for column in report_type["dimensions"]}
+    for metric in report_type["metrics"]:
+        types[metric] = NUMERIC if any(marker in metric for marker in FRACTIONAL_METRIC_MARKERS) else INTEGER
+    return types
+
+
+def detect_types(columns: list, sample: bytes, candidates: dict) -> dict:
+    """Base types of columns confirmed by sample rows (CSV without header), unknown columns are strings"""
+    values = [set() for _ in columns]
+    for row in csv.reader(io.StringIO(sample.decode("utf-8"))):
+        for position, value in enumerate(row[: len(columns)]):
+            if value:
+                values[position].add(value)
+    types = dict()
+    for column, column_values in zip(columns, values):
+        column_type = candidates.get(column, STRING)
+        while column_type != STRING and not all(_PATTERNS[column_type].fullmatch(value) for value in column_values):
+            column_type = _FALLBACK[column_type]
+        types[column] = column_type
+    return types
+
+
+def merge_types(types: dict, other_types: dict) -> dict:
+    """Types of columns valid for data of both type mappings (e.g. of two slices)"""
+    merged = dict(types)
+    for column, column_type in other_types.items():
+        if column not in merged or merged[column] == column_type:
+            merged[column] = column_type
+        else:
+            merged[column] = _GENERALIZATION.get(frozenset((merged[column], column_type)), STRING)
+    return merged
+
+
+def table_schema(columns: list, types: dict, primary_key: list) -> dict:
+    """Schema of an output table definition (see ComponentBase.create_out_table_definition)"""
+    return {
+        column: ColumnDefinition(
+            data_types=BaseType(dtype=SupportedDataTypes(types.get(column, STRING))),
+            primary_key=column in primary_key,
+        )
+        for column in columns
+    }
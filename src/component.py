@@ -3,19 +3,40 @@ Component is a main class implementing specific YouTube reporting extractor.
 
 """
 
-import csv
+import copy
+import json
 import logging
 import os
-from functools import cached_property
+import shutil
+import threading
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, as_completed, wait
+from datetime import date, datetime, timedelta
 
-import backoff
-from googleapiclient.errors import HttpError
 from keboola.component.base import ComponentBase
 from keboola.component.exceptions import UserException
 
+from column_metadata import candidate_types, detect_types, merge_types, table_schema
+from concurrency_controller import ConcurrencyController
 from configuration import Configuration
-from google_yt.client import Client
+from download_scheduler import DOWNLOAD_PRIORITIES, schedule_downloads
+from google_yt.async_client import BlockingAsyncClient
+from google_yt.client import MEGABYTE, Client
+from job_catalog import JobCatalog
+from parquet_output import column_types
+from report_projection import FILTER_OPERATORS, ReportProjection
 from report_types import DEPRECATED_REPORT_TYPE_MAPPING, report_types
+from report_writer import COMPRESSION_EXTENSIONS, OUTPUT_FORMATS, TABLE_COMPRESSIONS, ReportWriter
+from run_budget import RunBudget
+from slice_compaction import compact_slices
+
+# Implementations of the API client selectable in configuration (download_settings.api_client)
+API_CLIENTS = ("sync", "async")
+# Periods kept in the report ledger of a job (counted back from the latest period),
+# a regenerated report of an older period is simply loaded again
+LEDGER_RETENTION_DAYS = 180
+# Content owners whose jobs are prepared (cleaned up and created) at once, independent of the download settings
+MAX_PARALLEL_OWNERS = 4
 
 
 class Component(ComponentBase):
@@ -34,7 +55,11 @@ class Component(ComponentBase):
     def __init__(self):
         super().__init__()
         self.conf = None
+        self._client_lock = threading.Lock()
         self.client_yt = None
+        self.budget = RunBudget()
+        self.concurrency = ConcurrencyController()
+        self.projections = dict()
         logging.getLogger("googleapiclient.http").setLevel(logging.ERROR)
 
     def run(self):
@@ -50,18 +75,39 @@ class Component(ComponentBase):
                 - created .. True / False flag indicating whether the job was created by the component
                 - id .. ID of the job
                 - lastReportCreateTime .. used as a filter to optimize number of requests to the API
+                - reportLedger .. loaded reports by period (startTime -> report ID, createTime, content hash, size)
+            When more content owners are configured (content_owner_ids), the state holds the above for each of them:
+            - owners .. mapping of content owner ID to its state (onBehalfOfContentOwner, jobs)
 
         3) State cleanup
+            All jobs of the channel or content owner are listed into a catalog indexed by report type.
+            When the state holds valid jobs of all requested report types, only these jobs are looked up.
             Remove jobs that were created by the component but that are not requested in current run.
             (because of a change in component configuration)
+            Created jobs of content owners that are not configured anymore are removed as well.
+            Steps 3 and 4 run concurrently for content owners (MAX_PARALLEL_OWNERS at once), a failure of one owner
+            does not stop the others.
 
         4) Create needed job(s)
             If a report type is requested for which there is no job in the system then such a job is created.
+            If there are more jobs of a report type, the job from the state (or the oldest one) is used.
+            Jobs are deleted and created using batch requests.
 
         5) Download reports
-            For each requested report type check whether there were new report data available.
+            For each requested report type check whether there were new report data available
+            (reports of all report types are listed using batch requests).
+            Only reports of data periods within the backfill dates (if configured) are listed.
             When there are new report(s) for specific reporty type then collect most up-to-date information
             and prepare incremental output table for it.
+            Reports of all report types are downloaded concurrently by a shared pool of workers, in the order
+            given by download_settings.priority, up to download_settings.max_parallel_downloads reports
+            of a report type and download_settings.max_parallel_jobs report types at once. A failure of one report type does not stop the others,
+            its state is kept unchanged so it is retried in the next run.
+            When the run budget (download_settings.max_run_time_minutes / max_download_mb) is exhausted,
+            no more downloads are started. Reports downloaded so far are loaded, the rest is left for the next run.
+            With download_settings.adaptive_concurrency, the number of concurrent downloads is adjusted
+            to the achieved throughput and to throttling by the API (see ConcurrencyController).
+            With more content owners, output tables are named {content owner ID}_{report type ID}.
 
         6) Write new state
         """
@@ -72,8 +118,49 @@ class Component(ComponentBase):
         # Check configuration validity - report problem early
         if not self.conf.report_settings.report_types:
             raise UserException("Configuration has no report types specified")
-        if self.conf.on_behalf_of_content_owner and not self.conf.content_owner_id:
+        if self.conf.on_behalf_of_content_owner and not self.conf.content_owner_id and not self.conf.content_owner_ids:
             raise UserException("Configuration assumes explicit content owner but none is specified")
+        if self.conf.download_settings.api_client not in API_CLIENTS:
+            raise UserException(f"Unsupported API client: {self.conf.download_settings.api_client}")
+        if self.conf.download_settings.compressed_transfer and self.conf.download_settings.api_client != "async":
+            logging.warning(
+                "Compressed transfer is supported by the async API client only, "
+                "reports are downloaded without compression"
+            )
+        if self.conf.download_settings.chunk_size_mb < 1:
+            raise UserException("Download chunk size must be at least 1 MB")
+        if self.conf.download_settings.priority not in DOWNLOAD_PRIORITIES:
+            raise UserException(f"Unsupported download priority: {self.conf.download_settings.priority}")
+        if self.conf.download_settings.max_requests_per_second < 0:
+            raise UserException("Maximum number of requests per second must not be negative")
+        if self.conf.download_settings.max_run_time_minutes < 0 or self.conf.download_settings.max_download_mb < 0:
+            raise UserException("Run time and download budgets must not be negative")
+        self.budget = RunBudget(
+            max_seconds=self.conf.download_settings.max_run_time_minutes * 60,
+            max_bytes=self.conf.download_settings.max_download_mb * MEGABYTE,
+        )
+        if self.conf.output_settings.format not in OUTPUT_FORMATS:
+            raise UserException(f"Unsupported output format: {self.conf.output_settings.format}")
+        if self.conf.output_settings.compression not in TABLE_COMPRESSIONS:
+            raise UserException(f"Unsupported output compression: {self.conf.output_settings.compression}")
+        if self.conf.output_settings.raw_compression not in COMPRESSION_EXTENSIONS:
+            raise UserException(f"Unsupported raw files compression: {self.conf.output_settings.raw_compression}")
+        if (
+            self.conf.output_settings.max_slice_size_mb < 0
+            or self.conf.output_settings.max_slice_rows < 0
+            or self.conf.output_settings.compaction_target_mb < 0
+        ):
+            raise UserException("Slice size limits must not be negative")
+
+        report_settings = self.conf.report_settings
+        backfill_dates = []
+        for backfill_date in (report_settings.backfill_start_date, report_settings.backfill_end_date):
+            try:
+                backfill_dates.append(date.fromisoformat(backfill_date) if backfill_date else None)
+            except ValueError:
+                raise UserException(f"Invalid backfill date (expected YYYY-MM-DD): {backfill_date}")
+        if all(backfill_dates) and backfill_dates[0] > backfill_dates[1]:
+            raise UserException("Backfill start date must not be after backfill end date")
 
         # Migrate deprecated report type IDs to current versions
         migrated_types = []
@@ -85,75 +172,364 @@ class Component(ComponentBase):
             else:
                 migrated_types.append(rt)
         self.conf.report_settings.report_types = migrated_types
+        self.projections = self._report_projections()
 
         # Normalize configuration
         if not self.conf.on_behalf_of_content_owner:
             self.conf.content_owner_id = ""
+            self.conf.content_owner_ids = []
+        owners = list(dict.fromkeys(self.conf.content_owner_ids)) or [self.conf.content_owner_id]
+        multiple_owners = bool(self.conf.content_owner_ids)
 
         # 2) Retrieve state - get last state data/in/state.json from previous run
         previous_state = self.get_state_file()
         logging.debug(f"Original state: {previous_state}")
+        previous_owner_states = self._previous_owner_states(previous_state)
+
+        # 3) + 4) Cleanup and create needed jobs of all content owners
+        # Owners that are not configured anymore have their created jobs deleted
+        removed_owners = [
+            owner
+            for owner, owner_state in previous_owner_states.items()
+            if owner not in owners and any(job.get("created") for job in owner_state["jobs"].values())
+        ]
+        new_owner_states = dict()
+        owner_errors = dict()
+        max_workers = max(1, min(len(owners) + len(removed_owners), MAX_PARALLEL_OWNERS))
+        with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="owner") as executor:
+            futures = dict()
+            for owner in owners + removed_owners:
+                previous_owner_state = previous_owner_states.get(owner, {"onBehalfOfContentOwner": owner, "jobs": {}})
+                report_type_ids = self.conf.report_settings.report_types if owner in owners else []
+                future = executor.submit(self._prepare_owner_jobs, owner, previous_owner_state, report_type_ids)
+                futures[future] = owner
+            for future in as_completed(futures):
+                owner = futures[future]
+                try:
+                    owner_state = future.result()
+                except Exception as exc:
+                    if not multiple_owners:
+                        raise
+                    logging.error(f"Preparing jobs of content owner {owner} failed: {exc}")
+                    owner_errors[owner] = exc
+                    # keep the previous state, so that the owner is processed (or cleaned up) in the next run
+                    new_owner_states[owner] = previous_owner_states.get(
+                        owner, {"onBehalfOfContentOwner": owner, "jobs": {}}
+                    )
+                    continue
+                if owner in owners:
+                    new_owner_states[owner] = owner_state
+
+        if multiple_owners:
+            new_state = {"owners": new_owner_states}
+        else:
+            new_state = new_owner_states[owners[0]]
+
+        # 5) Download reports
+        # Jobs of all owners are processed together, each of them has its own output table
+        jobs = dict()
+        job_owners = dict()
+        for owner in owners:
+            if owner in owner_errors:
+                continue
+            for report_type_id, job in new_owner_states[owner]["jobs"].items():
+                table_name = f"{owner}_{report_type_id}" if multiple_owners else report_type_id
+                jobs[table_name] = job
+                job_owners[table_name] = owner
+        errors = self.process_jobs(jobs, owners=job_owners)
+
+        # 6) Write new state
+        self.write_state_file(new_state)
+        self._close_client()
 
+        errors.update(owner_errors)
+        if errors:
+            if not set(jobs) - set(errors):
+                # Nothing succeeded - report the first problem as the reason of the failure
+                raise next(iter(errors.values()))
+            logging.warning(f"Processing failed for: {', '.join(errors)}. They will be retried.")
+
+    def _report_projections(self) -> dict:
+        """Projections (kept columns, row filters) of report types configured in report_type_settings
+
+        Raises:
+            UserException: if a report type, column or filter operator is unknown
+        """
+        projections = dict()
+        for settings in self.conf.report_settings.report_type_settings:
+            report_type_id = DEPRECATED_REPORT_TYPE_MAPPING.get(settings.report_type, settings.report_type)
+            if report_type_id not in report_types:
+                raise UserException(f"Unknown report type in report type settings: {settings.report_type}")
+            known_columns = report_types[report_type_id]["dimensions"] + report_types[report_type_id]["metrics"]
+            filter_columns = [row_filter.column for row_filter in settings.filters]
+            unknown_columns = [column for column in settings.columns + filter_columns if column not in known_columns]
+            if unknown_columns:
+                raise UserException(f"Unknown columns of report type {report_type_id}: {', '.join(unknown_columns)}")
+            operators = [row_filter.operator for row_filter in settings.filters]
+            if any(operator not in FILTER_OPERATORS for operator in operators):
+                raise UserException(f"Unsupported row filter operator (expected one of {', '.join(FILTER_OPERATORS)})")
+            projections[report_type_id] = ReportProjection(
+                report_types[report_type_id]["dimensions"],
+                columns=settings.columns,
+                filters=[
+                    (row_filter.column, row_filter.operator, row_filter.values) for row_filter in settings.filters
+                ],
+            )
+        return projections
+
+    @staticmethod
+    def _previous_owner_states(previous_state: dict) -> dict:
+        """States of individual content owners (onBehalfOfContentOwner, jobs) from the state of previous run
+
+        The state of a run with a single owner (or the own channel) is the state of that owner,
+        the state of a run with more content owners keeps the states of owners by their IDs.
+        """
+        if "owners" in previous_state:
+            return previous_state["owners"]
         # normalize state to a compatible version
-        if "onBehalfOfContentOwner" not in previous_state:
-            previous_state["onBehalfOfContentOwner"] = ""
-        if "jobs" not in previous_state:
-            previous_state["jobs"] = dict()
+        owner = previous_state.get("onBehalfOfContentOwner", "")
+        return {owner: {"onBehalfOfContentOwner": owner, "jobs": previous_state.get("jobs", dict())}}
+
+    def _prepare_owner_jobs(self, owner: str, previous_owner_state: dict, report_type_ids: list) -> dict:
+        """Cleanup and create jobs of a content owner (steps 3 and 4)
 
+        Args:
+            owner: ID of the content owner, empty string for the own channel
+            previous_owner_state: state of the owner from previous run (onBehalfOfContentOwner, jobs)
+            report_type_ids: requested report types, created jobs of other report types are deleted
+
+        Returns:
+            New state of the owner with jobs of the requested report types
+        """
         # 3) Cleanup - remove created (by this configuration) jobs that are not requested
-        for key, job in previous_state["jobs"].items():
-            if job.get("created") and (
-                self.conf.content_owner_id != previous_state["onBehalfOfContentOwner"]
-                or key not in self.conf.report_settings.report_types
-            ):
-                context_description = f"Deleting job for {key}"
-                self.client.delete_job(
-                    job_id=job["id"],
-                    on_behalf_of_owner=previous_state["onBehalfOfContentOwner"],
-                    context_description=context_description,
-                )
+        catalog = self._load_job_catalog(owner, previous_owner_state, report_type_ids)
 
-        context_description = "listing all jobs" + (
-            f" for owner {self.conf.content_owner_id}" if self.conf.content_owner_id else ""
-        )
-        all_jobs = self.client.list_jobs(
-            on_behalf_of_owner=self.conf.content_owner_id, context_description=context_description
-        )
+        stale_jobs = {
+            key: job["id"]
+            for key, job in previous_owner_state["jobs"].items()
+            if job.get("created") and key not in report_type_ids and catalog.has_job(job["id"])
+        }
+        if stale_jobs:
+            self.client.delete_jobs(stale_jobs, on_behalf_of_owner=owner, context_description="Deleting job")
+            for job_id in stale_jobs.values():
+                catalog.remove(job_id)
 
-        new_state = {"onBehalfOfContentOwner": self.conf.content_owner_id, "jobs": dict()}
+        new_owner_state = {"onBehalfOfContentOwner": owner, "jobs": dict()}
 
         # 4) Create needed jobs
-        for report_type_id in self.conf.report_settings.report_types:
-            # search corresponding job among all available jobs
-            job_created = False
-            job = next(filter(lambda x: x["reportTypeId"] == report_type_id, all_jobs), None)
-            if not job:
-                new_job_name = f"keboola_{report_type_id}"
+        new_job_names = {
+            report_type_id: f"keboola_{report_type_id}"
+            for report_type_id in report_type_ids
+            if report_type_id not in catalog
+        }
+        created_jobs = dict()
+        if new_job_names:
+            for new_job_name in new_job_names.values():
                 logging.warning(f"No existing job found, creating new one named: {new_job_name}")
-                context_description = f"Creating job for {report_type_id}"
-                job = self.client.create_job(
-                    new_job_name,
-                    report_type_id=report_type_id,
-                    on_behalf_of_owner=self.conf.content_owner_id,
-                    context_description=context_description,
-                )
-                job_created = True
-            job_from_state = previous_state["jobs"].get(report_type_id)
+            created_jobs = self.client.create_jobs(
+                new_job_names, on_behalf_of_owner=owner, context_description="Creating job"
+            )
+            for job in created_jobs.values():
+                catalog.add(job)
+        for report_type_id in report_type_ids:
+            job_created = report_type_id in created_jobs
+            job_from_state = previous_owner_state["jobs"].get(report_type_id)
+            job = catalog.get(report_type_id, preferred_id=job_from_state["id"] if job_from_state else None)
             if job_from_state and job_from_state["id"] == job["id"]:
-                new_state["jobs"][report_type_id] = job_from_state
+                new_owner_state["jobs"][report_type_id] = job_from_state
             else:
-                new_state["jobs"][report_type_id] = job
+                new_owner_state["jobs"][report_type_id] = job
                 job["created"] = job_created
+        return new_owner_state
 
-        # 5) Download reports
-        for job in new_state["jobs"].values():
-            self.process_job(job)
+    def _load_job_catalog(self, owner: str, previous_owner_state: dict, report_type_ids: list) -> JobCatalog:
+        """Catalog of jobs of the channel or content owner
 
-        # 6) Write new state
-        self.write_state_file(new_state)
+        When the state holds jobs of all requested report types, these jobs are just looked up by their IDs
+        using batch requests. All jobs are listed only when a job is missing in the state,
+        does not exist anymore or the lookup fails.
+        """
+        state_jobs = previous_owner_state["jobs"]
+        if all(rt in state_jobs for rt in report_type_ids):
+            try:
+                jobs = self.client.get_jobs(
+                    {key: job["id"] for key, job in state_jobs.items()},
+                    on_behalf_of_owner=owner,
+                    context_description="Looking up job",
+                )
+            except UserException as exc:
+                logging.warning(f"Jobs from state could not be looked up, listing all jobs: {exc}")
+            else:
+                if all(rt in jobs and jobs[rt]["reportTypeId"] == rt for rt in report_type_ids):
+                    logging.info("All jobs from state exist, listing of all jobs is skipped")
+                    return JobCatalog(list(jobs.values()))
+                logging.info("Some jobs from state do not exist anymore, listing all jobs")
+
+        context_description = "listing all jobs" + (f" for owner {owner}" if owner else "")
+        return JobCatalog(self.client.list_jobs(on_behalf_of_owner=owner, context_description=context_description))
+
+    def process_jobs(self, jobs: dict, owners: dict = None) -> dict:
+        """Process jobs, reports of all jobs are downloaded in a bounded pool of workers
+
+        Reports of all jobs (created after lastReportCreateTime of the job and within the backfill window)
+        are listed at once first (for each content owner). Downloads of all jobs are started in the order given
+        by the priority policy (see download_settings.priority) and a job is finished (manifest, state)
+        as soon as its downloads are done. Downloads are submitted only up to the current concurrency limit
+        (see ConcurrencyController) and the limits of parallel jobs and downloads per job, so they start
+        in the scheduled order and none of them starts after the run budget is exhausted.
 
-    def process_job(self, job):
-        """Process reports associated with a job
+        Each job is processed in isolation. When a job fails before its output was finished (manifest written),
+        its partial output is discarded. Reports of a failed job are downloaded again in the next run
+        (lastReportCreateTime is updated only after all its reports were written), except for interrupted
+        downloads that continue where they stopped.
+
+        Jobs are processed on copies, a job of the state is updated from its processed copy when the job is done.
+        So the state written at the end of the run never contains a half-processed job.
+
+        Args:
+            jobs: mapping of output table name to job (items of the new state)
+            owners: mapping of output table name to content owner of the job, the configured owner by default
+
+        Returns:
+            Mapping of output table name to exception for jobs that failed
+        """
+        owners = owners or {table_name: self.conf.content_owner_id for table_name in jobs}
+        start_time_at_or_after, start_time_before = self._backfill_window()
+        reports, errors = dict(), dict()
+        for owner in sorted(set(owners.values())):
+            owner_reports, owner_errors = self.client.list_reports_for_jobs(
+                {
+                    table_name: (job["id"], job.get("lastReportCreateTime"))
+                    for table_name, job in jobs.items()
+                    if owners[table_name] == owner
+                },
+                on_behalf_of_owner=owner,
+                start_time_at_or_after=start_time_at_or_after,
+                start_time_before=start_time_before,
+                context_description="Listing reports",
+            )
+            reports.update(owner_reports)
+            errors.update(owner_errors)
+        for table_name, exc in errors.items():
+            logging.error(f"Listing reports of {table_name} failed: {exc}")
+
+        processed_jobs = {table_name: copy.deepcopy(jobs[table_name]) for table_name in reports}
+
+        def job_done(table_name: str, exc: Exception = None):
+            if exc:
+                logging.error(f"Processing of {table_name} failed: {exc}")
+                if not downloads.get(table_name, {}).get("output_finished"):
+                    self._discard_job_output(table_name)
+                errors[table_name] = exc
+            # The job is updated in place, it may be nested in the state of its content owner
+            jobs[table_name].clear()
+            jobs[table_name].update(processed_jobs[table_name])
+
+        downloads = dict()
+        for table_name, job_reports in reports.items():
+            try:
+                job_downloads = self._prepare_job(processed_jobs[table_name], job_reports, table_name)
+            except Exception as exc:
+                job_done(table_name, exc)
+                continue
+            if job_downloads:
+                downloads[table_name] = job_downloads
+            else:
+                job_done(table_name)
+
+        scheduled_downloads = schedule_downloads(
+            [(table_name, report) for table_name, job in downloads.items() for report in job["reports"]],
+            self.conf.download_settings.priority,
+        )
+        download_settings = self.conf.download_settings
+        max_parallel_jobs = max(1, download_settings.max_parallel_jobs)
+        max_parallel_downloads = max(1, download_settings.max_parallel_downloads)
+        max_workers = max_parallel_jobs * max_parallel_downloads
+        # Adaptive concurrency starts at the downloads of a single job and finds its level up to the pool size
+        self.concurrency = ConcurrencyController(
+            max_workers,
+            initial_limit=max_parallel_downloads if download_settings.adaptive_concurrency else None,
+            adaptive=download_settings.adaptive_concurrency,
+            throttling_count=lambda: self.client.rate_limiter.pressure_count,
+        )
+        # Downloads are submitted in the scheduled order, only as many as the current concurrency limit allows,
+        # so that a worker never waits for a slot with a download taken out of order. A download of a job
+        # at its limit of parallel downloads (or of a new job while max_parallel_jobs jobs are downloading)
+        # is skipped and keeps its place, the next pending download is submitted instead.
+        pending_downloads = deque(scheduled_downloads)
+        futures = dict()
+        # Number of downloads in progress by output table name, only jobs that are downloading are listed
+        job_downloads_in_progress = dict()
+        with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="download") as executor:
+            while pending_downloads or futures:
+                skipped_downloads = []
+                while pending_downloads and len(futures) < self.concurrency.limit:
+                    table_name, report = pending_downloads.popleft()
+                    in_progress = job_downloads_in_progress.get(table_name, 0)
+                    if in_progress >= max_parallel_downloads or (
+                        not in_progress and len(job_downloads_in_progress) >= max_parallel_jobs
+                    ):
+                        skipped_downloads.append((table_name, report))
+                        continue
+                    future = executor.submit(self._download_job_report, downloads[table_name], report)
+                    futures[future] = table_name, report
+                    job_downloads_in_progress[table_name] = in_progress + 1
+                pending_downloads.extendleft(reversed(skipped_downloads))
+                done_futures, _ = wait(futures, return_when=FIRST_COMPLETED)
+                for future in done_futures:
+                    table_name, report = futures.pop(future)
+                    job_downloads_in_progress[table_name] -= 1
+                    if not job_downloads_in_progress[table_name]:
+                        del job_downloads_in_progress[table_name]
+                    job_downloads = downloads[table_name]
+                    try:
+                        result = future.result()
+                    except Exception as exc:
+                        # Failure outside of the download itself (e.g. output file), the job fails when its other
+                        # downloads are done, so that they do not write into a discarded output
+                        job_downloads.setdefault("error", exc)
+                        result = None, exc
+                    job_downloads["results"][report["startTime"]] = result
+                    if len(job_downloads["results"]) < len(job_downloads["reports"]):
+                        continue
+                    try:
+                        if "error" in job_downloads:
+                            raise job_downloads["error"]
+                        self._finish_job(processed_jobs[table_name], job_downloads)
+                    except Exception as exc:
+                        job_done(table_name, exc)
+                    else:
+                        job_done(table_name)
+        return errors
+
+    def write_state_file(self, state_dict: dict):
+        """Write the state file atomically (a temporary file replaces the state), it is never left incomplete"""
+        state_path = os.path.join(self.configuration.data_dir, "out", "state.json")
+        with open(f"{state_path}.tmp", "w") as state_file:
+            json.dump(state_dict, state_file)
+        os.replace(f"{state_path}.tmp", state_path)
+
+    def _backfill_window(self) -> tuple[str, str]:
+        """Bounds of report data periods (startTimeAtOrAfter, startTimeBefore) by the configured backfill dates
+
+        Both dates are inclusive, an empty string means the bound is not set.
+        """
+        start_date = self.conf.report_settings.backfill_start_date
+        end_date = self.conf.report_settings.backfill_end_date
+        start_time_at_or_after = f"{start_date}T00:00:00Z" if start_date else ""
+        start_time_before = ""
+        if end_date:
+            start_time_before = f"{date.fromisoformat(end_date) + timedelta(days=1)}T00:00:00Z"
+        return start_time_at_or_after, start_time_before
+
+    def _discard_job_output(self, table_name: str):
+        """Remove partially written output of a failed job that has no manifest, so that it is not loaded"""
+        shutil.rmtree(f"{self.tables_out_path}/{table_name}.csv", ignore_errors=True)
+        shutil.rmtree(f"{self.files_out_path}/{table_name}.csv", ignore_errors=True)
+        shutil.rmtree(f"{self.files_out_path}/{table_name}.parquet", ignore_errors=True)
+
+    def _prepare_job(self, job: dict, reports: list, table_name: str = None) -> dict | None:
+        """Prepare downloads of reports associated with a job
 
         There is one job for each report_type_id. There may be more reports associated with a job.
         Each report comprises data for one 24hour period. System may generate more than one report
@@ -167,98 +543,326 @@ class Component(ComponentBase):
             - name: str - arbitrary name of the job
             - createTime: str - system information about the job (example: "2023-08-01T21:36:11Z")
             - lastReportCreateTime": str - information about last retrieved report
+            - pendingDownloads: dict - progress of interrupted downloads (startTime -> reportId, offset, columns)
+            - reportLedger: dict - loaded reports (startTime -> [report id, createTime, content hash, byte size])
+
+        lastReportCreateTime is updated only after all reports were written, so a failed job keeps its previous
+        state. If a download is interrupted, the rows received so far are kept in the output table
+        and the download continues from that point in the next run (unless a newer report replaces it).
+
+        The report ledger prevents loading the same data again. A report already recorded in the ledger
+        (loaded before another report of the job failed) is not downloaded at all. A regenerated report
+        of a period is downloaded, but when its content hash and size match the ledger, its slice is dropped.
 
+        Args:
+            job: job to process (copy of an item of the new state)
+            reports: reports of the job that were not processed yet (created after lastReportCreateTime)
+            table_name: name of the output table (without extension), the report type ID by default
+
+        Returns:
+            Downloads of the job (reports to download, output table, raw files folder, ...), processed
+            by _download_job_report and _finish_job. None if there is nothing to download, the job is done.
         """
 
-        # Retrie reports that were not processed yet (if no state info available then request all)
         logging.info(f"Processing job for report: {job.get('reportTypeId')}")
-        last_report_create_time = job.get("lastReportCreateTime")
-        context_description = f"Listing reports after {last_report_create_time}"
-        reports = self.client.list_reports(
-            job_id=job["id"], created_after=last_report_create_time, context_description=context_description
-        )
         if not reports:
             logging.warning(
                 "No new reports were found, the jobs weren't created yet or there are no new reports. "
                 "It may take up to 24 hours for a brand new job to generate reports."
             )
-            return
+            return None
 
         logging.info(f"{len(reports)} new reports found!")
 
-        # Prepare output table description (manifest)
-        # Note: We specify keys here but update columns information only after reports were downloaded
+        # Retrieve create time of the latest available report, it is stored in the new state once we are done
+        latest_report_create_time = max(report["createTime"] for report in reports)
+
+        # Consider only the last report among a set of reports for specific date period
+        reports = self._select_latest_reports(reports)
+
+        ledger = job.get("reportLedger", dict())
+        loaded_reports = [report for report in reports if ledger.get(report["startTime"], [None])[0] == report["id"]]
+        if loaded_reports:
+            logging.info(f"{len(loaded_reports)} reports were loaded already, skipping them")
+            reports = [report for report in reports if report not in loaded_reports]
+        if not reports:
+            job.pop("pendingDownloads", None)
+            job["lastReportCreateTime"] = latest_report_create_time
+            return None
+
+        # Output table description (manifest) is created only after reports were downloaded,
+        # when columns and their types are known
         report_type_id = job["reportTypeId"]
-        table_def = self.create_out_table_definition(
-            f"{report_type_id}.csv",
-            incremental=True,
-            is_sliced=True,
-            primary_key=report_types[report_type_id]["dimensions"],
+        table_name = table_name or report_type_id
+        if self.conf.output_settings.format == "parquet":
+            # Parquet files of periods are stored in file storage, there is no table
+            slice_path = f"{self.files_out_path}/{table_name}.parquet"
+        else:
+            slice_path = f"{self.tables_out_path}/{table_name}.csv"
+        os.makedirs(slice_path, exist_ok=True)
+
+        report_raw_full_path = None
+        if self.conf.output_settings.store_raw_files:
+            report_raw_full_path = f"{self.files_out_path}/{table_name}.csv"
+            os.makedirs(report_raw_full_path, exist_ok=True)
+
+        return {
+            "reports": reports,
+            "table_name": table_name,
+            "projection": self.projections.get(report_type_id),
+            "primary_key": report_types[report_type_id]["dimensions"],
+            "slice_path": slice_path,
+            "column_types": column_types(report_type_id),
+            "candidate_types": candidate_types(report_type_id),
+            "raw_path": report_raw_full_path,
+            "latest_report_create_time": latest_report_create_time,
+            "pending_downloads": job.get("pendingDownloads", dict()),
+            "ledger": ledger,
+            "results": dict(),
+        }
+
+    def _download_job_report(self, job_downloads: dict, report: dict) -> tuple[dict, Exception | None]:
+        """Download a report of a job prepared by _prepare_job (see _download_report_slice)"""
+        return self._download_report_slice(
+            report,
+            job_downloads["raw_path"],
+            job_downloads["slice_path"],
+            job_downloads["pending_downloads"].get(report["startTime"]),
+            job_downloads["ledger"].get(report["startTime"]),
+            job_downloads["projection"],
+            job_downloads["column_types"],
+            job_downloads["candidate_types"],
         )
-        os.makedirs(table_def.full_path, exist_ok=True)
 
-        report_raw_full_path = f"{self.files_out_path}/{report_type_id}.csv"
-        os.makedirs(report_raw_full_path, exist_ok=True)
+    def _finish_job(self, job: dict, job_downloads: dict):
+        """Write the manifest of the output table and update the job when all its downloads are done
+
+        Reports of individual periods are independent slices. Columns are taken from the first (oldest) period,
+        reduced by the projection of the report type (if configured). Base types of the columns suit the data
+        of all downloaded periods (see column_metadata). Small slices of consecutive periods are merged
+        before the manifest is written (see slice_compaction).
+        """
+        table_name = job_downloads["table_name"]
+        pending_downloads = job_downloads["pending_downloads"]
+        ledger = job_downloads["ledger"]
+        reports = job_downloads["reports"]
+        results = [job_downloads["results"][report["startTime"]] for report in reports]
+
+        # Reports not downloaded because the run budget was exhausted are left for the next run
+        skipped_reports = [report for report, (progress, _) in zip(reports, results) if progress is None]
+        if skipped_reports:
+            logging.info(f"{len(skipped_reports)} reports of {table_name} are left for the next run")
+            reports = [report for report in reports if report not in skipped_reports]
+            results = [result for result in results if result[0] is not None]
+        errors = [error for _, error in results if error]
+        columns = next((progress["columns"] for progress, _ in results if progress["columns"]), [])
+        if errors and not columns:
+            # Not even a header was received, there is nothing to load
+            raise errors[0]
+
+        if os.listdir(job_downloads["slice_path"]):
+            if self.conf.output_settings.format == "csv":
+                self._compact_job_output(job_downloads["slice_path"])
+                projection = job_downloads["projection"]
+                types = dict()
+                for progress, _ in results:
+                    types = merge_types(types, progress["types"])
+                table_def = self.create_out_table_definition(
+                    f"{table_name}.csv",
+                    incremental=True,
+                    is_sliced=True,
+                    schema=table_schema(
+                        projection.output_columns(columns) if projection else columns,
+                        types,
+                        job_downloads["primary_key"],
+                    ),
+                )
+                self.write_manifest(table_def)
+            job_downloads["output_finished"] = True
+        else:
+            # All downloaded reports were unchanged (or skipped), there is nothing to load
+            self._discard_job_output(table_name)
+
+        for report, (progress, error) in zip(reports, results):
+            if not error:
+                ledger[report["startTime"]] = [report["id"], report["createTime"], progress["hash"], progress["offset"]]
+        job["reportLedger"] = self._prune_ledger(ledger)
 
-        # Retrieve create time of the latest available report and store it in the new state
-        reports = sorted(reports, key=lambda d: d["createTime"], reverse=True)
         # By updating job object here we actually update an item in new state
-        job["lastReportCreateTime"] = reports[0]["createTime"]
-
-        # Sort list of reports based on data period (startTime) and then on creation time (createTime).
-        reports = sorted(reports, key=lambda d: d["startTime"] + d["createTime"])
-
-        for index in range(len(reports)):
-            report = reports[index]
-            # Consider only the last report among a set of reports for specific date period
-            if index + 1 == len(reports) or report["startTime"] != reports[index + 1]["startTime"]:
-                filename_raw = f"{report_raw_full_path}/{report['startTime'].replace(':', '_')}.csv"
-                filename_tgt = f"{table_def.full_path}/{report['startTime'].replace(':', '_')}.csv"
-
-                self.download_report_to_file(downloadUrl=report["downloadUrl"], target_filename=filename_raw)
-                if not table_def.column_names:
-                    columns = self._read_columns(filename_raw)
-                    table_def.add_columns(columns)
-                self._strip_header(filename_raw, filename_tgt)
-        # We store the manifest only after columns were updated according to downloaded report
-        self.write_manifest(table_def)
+        interrupted_downloads = {
+            report["startTime"]: pending_downloads[report["startTime"]]
+            for report in skipped_reports
+            if report["startTime"] in pending_downloads
+        }
+        interrupted_downloads.update(
+            {
+                report["startTime"]: {key: progress[key] for key in ("reportId", "offset", "columns")}
+                for report, (progress, error) in zip(reports, results)
+                if error and progress["offset"]
+            }
+        )
+        if interrupted_downloads:
+            job["pendingDownloads"] = interrupted_downloads
+        else:
+            job.pop("pendingDownloads", None)
+        if errors:
+            raise errors[0]
+        if not skipped_reports:
+            # Otherwise the same reports are listed again in the next run, the ledger tells the downloaded ones
+            job["lastReportCreateTime"] = job_downloads["latest_report_create_time"]
+
+    def _compact_job_output(self, slice_path: str):
+        """Merge small slices of the output table up to the compaction target (within the slice size limits)"""
+        output_settings = self.conf.output_settings
+        if output_settings.compaction_target_mb:
+            compact_slices(
+                slice_path,
+                output_settings.compression,
+                target_bytes=output_settings.compaction_target_mb * MEGABYTE,
+                max_bytes=output_settings.max_slice_size_mb * MEGABYTE,
+                max_rows=output_settings.max_slice_rows,
+            )
 
     @staticmethod
-    def _read_columns(filename) -> list:
-        with open(filename) as csvfile:
-            csvreader = csv.reader(csvfile, delimiter=",")
-            header = next(csvreader)
-            return header
+    def _select_latest_reports(reports: list) -> list:
+        """Select the latest report (by createTime) for each data period (startTime)
 
-    @staticmethod
-    def _strip_header(filename_raw, filename_tgt):
-        """Copy csv file to destination without header line
         Args:
-            filename_raw: Original csv file containing header line
-            filename_tgt: Destination csv file without header line
+            reports: reports as returned by list_reports
+
+        Returns:
+            A list of reports, one per data period, ordered by startTime
         """
-        with open(filename_raw) as src, open(filename_tgt, mode="w") as tgt:
-            src.readline()
-            while True:
-                row = src.readline()
-                if not row:
-                    break
-                tgt.write(row)
-        pass
-
-    @backoff.on_exception(backoff.expo, HttpError, jitter=None, max_tries=3, base=1.7, factor=24)
-    def download_report_to_file(self, downloadUrl: str, target_filename: str):
-        """Download a report from media URL to target CSV file
+        latest_reports = dict()
+        # Sort list of reports based on data period (startTime) and then on creation time (createTime),
+        # so the later report for the same period replaces the earlier one.
+        for report in sorted(reports, key=lambda d: d["startTime"] + d["createTime"]):
+            latest_reports[report["startTime"]] = report
+        return list(latest_reports.values())
+
+    @staticmethod
+    def _prune_ledger(ledger: dict) -> dict:
+        """Keep ledger entries of periods up to LEDGER_RETENTION_DAYS before the latest period, ordered by period"""
+        if not ledger:
+            return ledger
+        oldest_kept = datetime.fromisoformat(max(ledger)) - timedelta(days=LEDGER_RETENTION_DAYS)
+        return {
+            start_time: entry
+            for start_time, entry in sorted(ledger.items())
+            if datetime.fromisoformat(start_time) >= oldest_kept
+        }
+
+    def _download_report_slice(
+        self,
+        report: dict,
+        raw_path: str | None,
+        table_path: str,
+        pending_download: dict = None,
+        loaded_report: list = None,
+        projection: ReportProjection = None,
+        slice_column_types: dict = None,
+        slice_candidate_types: dict = None,
+    ) -> tuple[dict, Exception | None]:
+        """Download a report and store its data as a header-less slice of the output table
+
+        The data are streamed chunk by chunk, the header line is captured on the fly.
+        Compression of the transfer and of the output files follows the configuration.
+        When the download of the same report was interrupted in a previous run, it continues where it stopped
+        (into a new slice, as the rows received before were already loaded).
+        When the content of the report matches the report loaded for the same period before, the slice is removed.
+        A large report is split into more slices by the slice size limits of the output settings.
 
         Args:
-            downloadUrl: URL providing report data
-            target_filename: Local file where to write the data
+            report: report resource as returned by list_reports
+            raw_path: folder where the original report file is stored, None if it shall not be stored
+            table_path: folder of the sliced output table (or of Parquet files of periods)
+            pending_download: progress of an interrupted download of the report period from previous run
+            loaded_report: ledger entry of the report period loaded before (report id, createTime, hash, size)
+            projection: columns and rows of the report to keep in the output table, all of them if None
+            slice_column_types: types of columns of Parquet output (see parquet_output.column_types)
+            slice_candidate_types: candidate base types of columns of the slice (see column_metadata.candidate_types)
+
+        Returns:
+            Download progress (reportId, offset of the first byte not written yet, columns of the report,
+            content hash, base types of columns of the slice) and an error if the download failed.
+            Rows received before the failure stay in the slice.
+            The progress is None if the download was not started because the run budget is exhausted.
         """
-        context_description = f"Downloading report to file {target_filename}"
-        logging.info(context_description)
-        self.client.download_report_file(
-            download_url=downloadUrl, filename=target_filename, context_description=context_description
-        )
+        download_settings = self.conf.download_settings
+        output_settings = self.conf.output_settings
+        file_name = report["startTime"].replace(":", "_")
+        start_offset = 0
+        columns = None
+        if pending_download and pending_download["reportId"] == report["id"]:
+            start_offset = pending_download["offset"]
+            columns = pending_download["columns"]
+            file_name = f"{file_name}_{start_offset}"
+        filename_raw = None
+        if raw_path:
+            filename_raw = f"{raw_path}/{file_name}.csv{COMPRESSION_EXTENSIONS[output_settings.raw_compression]}"
+        if output_settings.format == "parquet":
+            filename_tgt = f"{table_path}/{file_name}.parquet"
+        else:
+            filename_tgt = f"{table_path}/{file_name}.csv{COMPRESSION_EXTENSIONS[output_settings.compression]}"
+
+        context_description = f"Downloading report to file {filename_tgt}"
+        if start_offset:
+            context_description += f" (continuing at byte {start_offset})"
+        error = None
+        with self.concurrency.slot() as sample:
+            # The budget may be exhausted while waiting for the slot
+            if self.budget.exhausted():
+                sample.skipped = True
+                return None, None
+            logging.info(context_description)
+            writer = ReportWriter(
+                filename_tgt,
+                filename_raw,
+                compression=output_settings.compression,
+                raw_compression=output_settings.raw_compression,
+                start_offset=start_offset,
+                columns=columns,
+                projection=projection,
+                output_format=output_settings.format,
+                column_types=slice_column_types,
+                max_slice_bytes=output_settings.max_slice_size_mb * MEGABYTE,
+                max_slice_rows=output_settings.max_slice_rows,
+            )
+            try:
+                with writer:
+                    self.client.download_report(
+                        download_url=report["downloadUrl"],
+                        out_stream=writer,
+                        start_offset=start_offset,
+                        compressed_transfer=download_settings.compressed_transfer,
+                        chunk_size=download_settings.chunk_size_mb * MEGABYTE,
+                        adaptive_chunk_size=download_settings.adaptive_chunk_size,
+                        context_description=context_description,
+                    )
+            except Exception as exc:
+                logging.error(f"Download of report {report['id']} failed at byte {writer.offset}: {exc}")
+                error = exc
+            sample.bytes = writer.offset - start_offset
+            sample.error = error
+        self.budget.add_bytes(writer.offset - start_offset)
+        if (
+            not error
+            and writer.content_hash
+            and loaded_report
+            and loaded_report[2:] == [writer.content_hash, writer.offset]
+        ):
+            logging.info(f"Report {report['id']} for period {report['startTime']} is unchanged, it is not loaded again")
+            for slice_filename in writer.slice_filenames:
+                os.remove(slice_filename)
+            if filename_raw:
+                os.remove(filename_raw)
+        return {
+            "reportId": report["id"],
+            "offset": writer.offset,
+            "columns": writer.columns,
+            "hash": writer.content_hash,
+            "types": detect_types(writer.output_columns, writer.sample, slice_candidate_types or dict()),
+        }, error
 
     # Eventually we opted not to read report type ids dynamically.
     # Instead, we just use fixed set of types as retrieved from the API documentation.
@@ -268,27 +872,43 @@ class Component(ComponentBase):
     #     results = [SelectElement(value=tid['id'], label=f"{tid['name']} ({tid['id']})") for tid in report_type_ids]
     #     return results
 
-    @cached_property
-    def client(self) -> Client:
+    @property
+    def client(self) -> Client | BlockingAsyncClient:
         """Retrieve google client for communication to the YT reporting service.
 
+        The client is shared by all worker threads. The default (sync) API client uses a separate http transport
+        for each thread, requests of the async API client are multiplexed over a pool of HTTP/2 connections.
         If this is the first access to a client, application tries to create it. There are two options available:
         1) Create a client just by supplying an access token found in parameters as '#api_token'.
             It is used just during development when OAuth2 was not yet provided.
         2) Create a client using OAuth credentials from component configuration.
             This option ignores 'access_token'. It always creates a new token from a 'refresh_token'
         """
-        if not self.client_yt:
-            user = passwd = ""
-            token_data = None
-            api_token = self.configuration.parameters.get("#api_token")
-            if not api_token:
-                user = self.configuration.oauth_credentials.appKey
-                passwd = self.configuration.oauth_credentials.appSecret
-                token_data = self.configuration.oauth_credentials.data
-            self.client_yt = Client(access_token=api_token, client_id=user, app_secret=passwd, token_data=token_data)
+        with self._client_lock:
+            if not self.client_yt:
+                user = passwd = ""
+                token_data = None
+                api_token = self.configuration.parameters.get("#api_token")
+                if not api_token:
+                    user = self.configuration.oauth_credentials.appKey
+                    passwd = self.configuration.oauth_credentials.appSecret
+                    token_data = self.configuration.oauth_credentials.data
+                client_class = BlockingAsyncClient
+                if not self.conf or self.conf.download_settings.api_client != "async":
+                    client_class = Client
+                client_parameters = dict(
+                    access_token=api_token, client_id=user, app_secret=passwd, token_data=token_data
+                )
+                if self.conf:
+                    client_parameters["requests_per_second"] = self.conf.download_settings.max_requests_per_second
+                self.client_yt = client_class(**client_parameters)
         return self.client_yt
 
+    def _close_client(self):
+        if isinstance(self.client_yt, BlockingAsyncClient):
+            self.client_yt.close()
+            self.client_yt = None
+
 
 """
         Main entrypoint
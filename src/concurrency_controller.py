@@ -0,0 +1,133 @@
+"""
+Adaptive concurrency of report downloads.
+
+A fixed number of workers does not suit all accounts: small channels leave workers idle, large content owners
+run into rate limiting. The controller limits the number of downloads running at once and adjusts the limit
+by AIMD (additive increase, multiplicative decrease) after each window of finished downloads:
+the limit grows by one while the throughput rises and downloads do not fail, it is halved on throttling
+(quota pressure of the API), on failures or on a latency spike.
+"""
+
+import logging
+import threading
+import time
+from collections.abc import Callable
+from contextlib import contextmanager
+
+from google_yt.rate_limiter import THROTTLING_STATUS_CODES
+
+# Minimum number of downloads evaluated at once (a window has at least as many downloads as the current limit)
+MIN_WINDOW_SIZE = 2
+# Relative throughput gain required to increase the limit further
+THROUGHPUT_GAIN_THRESHOLD = 1.05
+# Latency (seconds per downloaded byte) over this multiple of the best latency seen is a spike
+LATENCY_SPIKE_FACTOR = 2.0
+# Share of failed downloads in a window that cuts the limit
+MAX_ERROR_RATE = 0.1
+
+
+class DownloadSample:
+    """Outcome of a download measured by the controller, the caller fills in the bytes and the error
+
+    A download which was not started after all (e.g. the run budget is exhausted) is marked as skipped,
+    it is not evaluated.
+    """
+
+    def __init__(self):
+        self.bytes = 0
+        self.error = None
+        self.duration = 0.0
+        self.skipped = False
+
+
+class ConcurrencyController:
+    """Thread-safe limit of concurrent downloads
+
+    Args:
+        max_limit: Upper bound of concurrent downloads (the number of workers)
+        initial_limit: Limit of the first window, max_limit by default
+        adaptive: Adjust the limit by AIMD, otherwise the limit stays fixed
+        throttling_count: Function returning the number of throttling events observed so far
+            (e.g. quota pressure signalled to the rate limiter of the API client)
+    """
+
+    def __init__(
+        self,
+        max_limit: int = 1,
+        initial_limit: int = None,
+        adaptive: bool = False,
+        throttling_count: Callable[[], int] = None,
+    ):
+        self.max_limit = max(1, max_limit)
+        self.limit = min(self.max_limit, max(1, initial_limit or self.max_limit))
+        self.adaptive = adaptive
+        self._throttling_count = throttling_count or (lambda: 0)
+        self._last_throttling_count = self._throttling_count()
+        self._active = 0
+        self._condition = threading.Condition()
+        self._window = []
+        self._window_started = time.monotonic()
+        self._last_throughput = 0.0
+        self._best_latency = None
+
+    @contextmanager
+    def slot(self):
+        """Wait until a download may start, measure it and release its slot when it is done"""
+        with self._condition:
+            self._condition.wait_for(lambda: self._active < self.limit)
+            self._active += 1
+        sample = DownloadSample()
+        started = time.monotonic()
+        try:
+            yield sample
+        finally:
+            sample.duration = time.monotonic() - started
+            with self._condition:
+                self._active -= 1
+                if self.adaptive and not sample.skipped:
+                    self._window.append(sample)
+                    if len(self._window) >= max(MIN_WINDOW_SIZE, self.limit):
+                        self._adjust()
+                self._condition.notify_all()
+
+    def _adjust(self):
+        """Evaluate the finished window and set the limit of the next one (called holding the lock)"""
+        now = time.monotonic()
+        window, self._window = self._window, []
+        window_bytes = sum(sample.bytes for sample in window)
+        throughput = window_bytes / max(now - self._window_started, 1e-6)
+        latency = sum(sample.duration for sample in window) / max(window_bytes, 1)
+        failed = [sample for sample in window if sample.error]
+        throttling_count = self._throttling_count()
+        throttled = throttling_count != self._last_throttling_count or any(
+            getattr(sample.error, "status_code", None) in THROTTLING_STATUS_CODES for sample in failed
+        )
+        self._last_throttling_count = throttling_count
+        self._window_started = now
+
+        limit = self.limit
+        if throttled:
+            reason = "throttling"
+            limit = max(1, limit // 2)
+        elif len(failed) > MAX_ERROR_RATE * len(window):
+            reason = f"{len(failed)} of {len(window)} downloads failed"
+            limit = max(1, limit // 2)
+        elif self._best_latency and latency > self._best_latency * LATENCY_SPIKE_FACTOR:
+            reason = "latency spike"
+            limit = max(1, limit // 2)
+        elif throughput > self._last_throughput * THROUGHPUT_GAIN_THRESHOLD:
+            reason = "throughput rises"
+            limit = min(self.max_limit, limit + 1)
+        else:
+            reason = "throughput does not rise"
+        if window_bytes and (self._best_latency is None or latency < self._best_latency):
+            self._best_latency = latency
+        self._last_throughput = throughput
+
+        if limit != self.limit:
+            logging.info(
+                f"Download concurrency {self.limit} -> {limit} ({reason}, {throughput / (1024 * 1024):.2f} MB/s)"
+            )
+        else:
+            logging.debug(f"Download concurrency stays {limit} ({reason}, {throughput / (1024 * 1024):.2f} MB/s)")
+        self.limit = limit
@@ -1,4 +1,4 @@
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 
 import dataconf
 
@@ -9,14 +9,60 @@ class ConfigurationBase:
         return dataconf.dict(parameters, Configuration, ignore_unexpected=True)
 
 
+@dataclass
+class RowFilter:
+    column: str
+    values: list[str]
+    operator: str = "in"
+
+
+@dataclass
+class ReportTypeSettings:
+    report_type: str
+    columns: list[str] = field(default_factory=list)
+    filters: list[RowFilter] = field(default_factory=list)
+
+
 @dataclass
 class ReportSettings:
     report_types: list[str]
+    backfill_start_date: str = ""
+    backfill_end_date: str = ""
+    report_type_settings: list[ReportTypeSettings] = field(default_factory=list)
+
+
+@dataclass
+class DownloadSettings:
+    max_parallel_jobs: int = 4
+    max_parallel_downloads: int = 4
+    adaptive_concurrency: bool = False
+    compressed_transfer: bool = False
+    chunk_size_mb: int = 100
+    adaptive_chunk_size: bool = False
+    api_client: str = "sync"
+    max_run_time_minutes: int = 0
+    max_download_mb: int = 0
+    priority: str = "oldest_first"
+    max_requests_per_second: float = 10.0
+
+
+@dataclass
+class OutputSettings:
+    format: str = "csv"
+    store_raw_files: bool = True
+    compression: str = "none"
+    raw_compression: str = "none"
+    max_slice_size_mb: int = 0
+    max_slice_rows: int = 0
+    compaction_target_mb: int = 32
 
 
 @dataclass
 class Configuration(ConfigurationBase):
     report_settings: ReportSettings
+    download_settings: DownloadSettings = field(default_factory=DownloadSettings)
+    output_settings: OutputSettings = field(default_factory=OutputSettings)
     on_behalf_of_content_owner: bool = False
     content_owner_id: str = ""
+    content_owner_ids: list[str] = field(default_factory=list)
     debug: bool = False
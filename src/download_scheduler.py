@@ -0,0 +1,35 @@
+"""
+Order of report downloads across all jobs of a run.
+
+Downloads of all report types share one pool of workers and they are started in the order given
+by a priority policy. When a run cannot download everything (see run budget), the policy decides
+which reports are downloaded in this run and which are left for the next one.
+"""
+
+# Supported priority policies (download_settings.priority)
+DOWNLOAD_PRIORITIES = ("oldest_first", "newest_first", "expiring_first")
+
+
+def schedule_downloads(downloads: list, priority: str = "oldest_first") -> list:
+    """Order downloads of reports according to a priority policy
+
+    Policies:
+        - oldest_first: the oldest data periods first, so the data are loaded in chronological order
+        - newest_first: the most recent data periods first, for data freshness
+        - expiring_first: reports generated first are downloaded first, as YouTube deletes reports
+          a fixed time after their generation. It prevents losing reports of a long backlog.
+
+    Args:
+        downloads: list of (key, report) tuples, the key identifies the job of the report
+        priority: One of DOWNLOAD_PRIORITIES
+
+    Returns:
+        Ordered list of the downloads. Downloads of the same priority keep their original order.
+    """
+    if priority == "oldest_first":
+        return sorted(downloads, key=lambda download: download[1]["startTime"])
+    if priority == "newest_first":
+        return sorted(downloads, key=lambda download: download[1]["startTime"], reverse=True)
+    if priority == "expiring_first":
+        return sorted(downloads, key=lambda download: download[1]["createTime"])
+    raise ValueError(f"Unsupported download priority: {priority}")
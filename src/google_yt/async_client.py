@@ -0,0 +1,462 @@
+"""
+Asynchronous client of the YouTube Reporting API.
+
+AsyncClient implements the same operations as google_yt.client.Client, but it calls the REST API directly
+using httpx over HTTP/2 with a pool of keep-alive connections shared by all requests.
+Operations that Client groups into batch requests (create_jobs, delete_jobs, get_jobs, list_reports_for_jobs)
+are executed as concurrent requests instead.
+BlockingAsyncClient runs AsyncClient in an event loop of a background thread and exposes the blocking interface
+of Client, so a single instance may be shared by all worker threads of the component.
+"""
+
+import asyncio
+import io
+import logging
+import threading
+import time
+from collections.abc import Callable
+from functools import wraps
+
+import google_auth_httplib2
+import httplib2
+import httpx
+from keboola.component.exceptions import UserException
+
+from .client import (
+    API_VERSION,
+    CHUNK_MAX_TRIES,
+    MEGABYTE,
+    REQUEST_MAX_TRIES,
+    _is_permanent_error,
+    _is_throttling_error,
+    _retry_after,
+    _retry_delay,
+    _start_time_filter,
+    build_credentials,
+)
+from .rate_limiter import DEFAULT_REQUESTS_PER_SECOND, RateLimiter, parse_retry_after
+
+API_BASE_URL = f"https://youtubereporting.googleapis.com/{API_VERSION}"
+# With HTTP/2 many concurrent requests are multiplexed over a few pooled connections
+MAX_CONNECTIONS = 20
+MAX_KEEPALIVE_CONNECTIONS = 10
+REQUEST_TIMEOUT = httpx.Timeout(60.0, connect=20.0)
+# Size of blocks passed from the response stream to the output stream
+STREAM_BLOCK_SIZE = 1 * MEGABYTE
+
+
+class AsyncHttpError(Exception):
+    """Unsuccessful response of the API (counterpart of googleapiclient HttpError)"""
+
+    def __init__(self, response: httpx.Response):
+        self.status_code = response.status_code
+        self.retry_after = parse_retry_after(response.headers.get("retry-after"))
+        try:
+            self.reason = response.json()["error"]["message"]
+        except Exception:
+            self.reason = response.reason_phrase
+        super().__init__(f"Http error {self.status_code}: {self.reason}")
+
+
+async def _raise_for_status(response: httpx.Response):
+    if response.is_error:
+        await response.aread()
+        raise AsyncHttpError(response)
+
+
+def _owner_params(on_behalf_of_owner: str) -> dict:
+    return {"onBehalfOfContentOwner": on_behalf_of_owner} if on_behalf_of_owner else {}
+
+
+async def _gather_by_key(coroutines: dict) -> dict:
+    """Run coroutines concurrently, results (or raised exceptions) are mapped to the keys of the coroutines"""
+    results = await asyncio.gather(*coroutines.values(), return_exceptions=True)
+    return dict(zip(coroutines, results))
+
+
+def _raise_errors(results: dict):
+    errors = [result for result in results.values() if isinstance(result, Exception)]
+    if errors:
+        raise UserException("; ".join(str(error) for error in errors))
+
+
+class MediaStream:
+    """Progress of a streamed media download, a retried attempt continues at the last written byte"""
+
+    def __init__(self, url: str, out_stream, start_offset: int = 0, compressed_transfer: bool = False):
+        self.url = url
+        self.out_stream = out_stream
+        self.progress = start_offset
+        self.compressed_transfer = compressed_transfer
+
+
+class AsyncClient:
+    def __init__(
+        self,
+        access_token: str = None,
+        client_id: str = None,
+        app_secret: str = None,
+        token_data: dict = None,
+        max_connections: int = MAX_CONNECTIONS,
+        requests_per_second: float = DEFAULT_REQUESTS_PER_SECOND,
+    ):
+        self._credentials = build_credentials(access_token, client_id, app_secret, token_data)
+        self.rate_limiter = RateLimiter(requests_per_second)
+        self._token_lock = asyncio.Lock()
+        self._http = httpx.AsyncClient(
+            http2=True,
+            limits=httpx.Limits(max_connections=max_connections, max_keepalive_connections=MAX_KEEPALIVE_CONNECTIONS),
+            timeout=REQUEST_TIMEOUT,
+        )
+
+    async def aclose(self):
+        await self._http.aclose()
+
+    @staticmethod
+    def handle_http_error(func):
+        """Handle Http communication errors in a uniform manner (see Client.handle_http_error)
+
+        Raises:
+            Exception: AsyncHttpError will be converted to UserException using context_description parameter
+        """
+
+        @wraps(func)
+        async def wrapper(self, *args, **kwargs):
+            context_description = kwargs.get("context_description") if "context_description" in kwargs else ""
+            try:
+                return await func(self, *args, **kwargs)
+            except AsyncHttpError as error:
+                raise UserException(f"{context_description} - Http error {error.status_code}: {error.reason}")
+
+        return wrapper
+
+    async def _authorization_headers(self) -> dict:
+        """Authorization header with a valid access token, the token is refreshed once for all pending requests"""
+        async with self._token_lock:
+            if not self._credentials.valid:
+                request = google_auth_httplib2.Request(httplib2.Http())
+                await asyncio.to_thread(self._credentials.refresh, request)
+        return {"Authorization": f"Bearer {self._credentials.token}"}
+
+    async def _call(
+        self,
+        call: Callable,
+        retry_on: tuple = (AsyncHttpError,),
+        max_tries: int = REQUEST_MAX_TRIES,
+        on_retry: Callable = None,
+    ):
+        """Call the API through the rate limiter, calls failing with a transient error are retried (see Client._call)
+
+        Args:
+            call: coroutine function sending the request, called without arguments
+            retry_on: exceptions considered as a failure of the request
+            max_tries: maximum number of attempts
+            on_retry: function called with the error and the attempt number before the call is retried
+        """
+        for attempt in range(1, max_tries + 1):
+            await self.rate_limiter.acquire_async()
+            try:
+                return await call()
+            except retry_on as error:
+                if attempt == max_tries or _is_permanent_error(error):
+                    raise
+                if on_retry:
+                    on_retry(error, attempt)
+                retry_after = _retry_after(error)
+                if _is_throttling_error(error):
+                    self.rate_limiter.slow_down(retry_after)
+                    if retry_after is not None:
+                        continue  # the rate limiter holds the request (and all others) for the requested time
+                await asyncio.sleep(retry_after if retry_after is not None else _retry_delay(attempt))
+
+    async def _request(self, method: str, path: str, params: dict = None, body: dict = None) -> dict:
+        async def send():
+            headers = await self._authorization_headers()
+            url = f"{API_BASE_URL}/{path}"
+            response = await self._http.request(method, url, params=params, json=body, headers=headers)
+            await _raise_for_status(response)
+            return response.json() if response.content else {}
+
+        return await self._call(send)
+
+    @handle_http_error
+    async def list_report_types(self, on_behalf_of_owner="", include_system_managed=False, context_description=""):
+        """Returns a list of report types that the channel or content owner can retrieve (see Client)"""
+        params = _owner_params(on_behalf_of_owner)
+        if include_system_managed:
+            params["includeSystemManaged"] = "true"
+        results = await self._request("GET", "reportTypes", params=params)
+        return results.get("reportTypes")
+
+    @handle_http_error
+    async def create_job(self, name: str, report_type_id: str, on_behalf_of_owner="", context_description=""):
+        """Create a job for specific report type (see Client)"""
+        body = {"name": name, "reportTypeId": report_type_id}
+        return await self._request("POST", "jobs", params=_owner_params(on_behalf_of_owner), body=body)
+
+    @handle_http_error
+    async def delete_job(self, job_id: str, on_behalf_of_owner="", context_description=""):
+        """Delete existing job, non-existent job is not an error (see Client)"""
+        try:
+            await self._request("DELETE", f"jobs/{job_id}", params=_owner_params(on_behalf_of_owner))
+        except AsyncHttpError as ex:
+            if ex.status_code != 404:
+                raise
+
+    async def create_jobs(self, job_names: dict, on_behalf_of_owner="", context_description=""):
+        """Create jobs for several report types concurrently (see Client.create_jobs)"""
+        results = await _gather_by_key(
+            {
+                report_type_id: self.create_job(
+                    name,
+                    report_type_id=report_type_id,
+                    on_behalf_of_owner=on_behalf_of_owner,
+                    context_description=f"{context_description} for {report_type_id}",
+                )
+                for report_type_id, name in job_names.items()
+            }
+        )
+        _raise_errors(results)
+        return results
+
+    async def delete_jobs(self, job_ids: dict, on_behalf_of_owner="", context_description=""):
+        """Delete existing jobs concurrently, non-existent job is not an error (see Client.delete_jobs)"""
+        results = await _gather_by_key(
+            {
+                key: self.delete_job(
+                    job_id,
+                    on_behalf_of_owner=on_behalf_of_owner,
+                    context_description=f"{context_description} for {key}",
+                )
+                for key, job_id in job_ids.items()
+            }
+        )
+        _raise_errors(results)
+
+    @handle_http_error
+    async def get_job(self, job_id: str, on_behalf_of_owner="", context_description=""):
+        """Look up a job by its ID, None if the job does not exist"""
+        try:
+            return await self._request("GET", f"jobs/{job_id}", params=_owner_params(on_behalf_of_owner))
+        except AsyncHttpError as ex:
+            if ex.status_code != 404:
+                raise
+        return None
+
+    async def get_jobs(self, job_ids: dict, on_behalf_of_owner="", context_description=""):
+        """Look up jobs by their IDs concurrently (see Client.get_jobs)"""
+        results = await _gather_by_key(
+            {
+                key: self.get_job(
+                    job_id,
+                    on_behalf_of_owner=on_behalf_of_owner,
+                    context_description=f"{context_description} for {key}",
+                )
+                for key, job_id in job_ids.items()
+            }
+        )
+        _raise_errors(results)
+        return {key: job for key, job in results.items() if job is not None}
+
+    @handle_http_error
+    async def list_jobs(self, on_behalf_of_owner: str = "", include_system_managed=False, context_description=""):
+        """List jobs, all pages (see Client)"""
+        params = _owner_params(on_behalf_of_owner)
+        if include_system_managed:
+            params["includeSystemManaged"] = "true"
+        jobs = []
+        while True:
+            results = await self._request("GET", "jobs", params=params)
+            jobs.extend(results.get("jobs", []))
+            if "nextPageToken" not in results:
+                break  # There are no more data, leave the loop
+            params["pageToken"] = results["nextPageToken"]
+
+        return jobs
+
+    @handle_http_error
+    async def list_reports(
+        self,
+        job_id: str,
+        on_behalf_of_owner: str = "",
+        created_after: str = "",
+        start_time_at_or_after: str = "",
+        start_time_before: str = "",
+        context_description="",
+    ):
+        """List reports associated with specified job (see Client)"""
+        params = _owner_params(on_behalf_of_owner)
+        if created_after:
+            params["createdAfter"] = created_after
+        params.update(_start_time_filter(start_time_at_or_after, start_time_before))
+        reports = []
+        while True:
+            results = await self._request("GET", f"jobs/{job_id}/reports", params=params)
+            if "reports" not in results:
+                break  # if there were no reports yet, there is no reports list at all
+            reports.extend(results["reports"])
+            if "nextPageToken" not in results:
+                break  # There are no more data, leave the loop
+            params["pageToken"] = results["nextPageToken"]
+
+        return reports
+
+    async def list_reports_for_jobs(
+        self,
+        jobs: dict,
+        on_behalf_of_owner: str = "",
+        start_time_at_or_after: str = "",
+        start_time_before: str = "",
+        context_description="",
+    ):
+        """List reports of several jobs concurrently (see Client.list_reports_for_jobs)"""
+        results = await _gather_by_key(
+            {
+                key: self.list_reports(
+                    job_id=job_id,
+                    on_behalf_of_owner=on_behalf_of_owner,
+                    created_after=created_after,
+                    start_time_at_or_after=start_time_at_or_after,
+                    start_time_before=start_time_before,
+                    context_description=f"{context_description} for {key}",
+                )
+                for key, (job_id, created_after) in jobs.items()
+            }
+        )
+        reports = {key: result for key, result in results.items() if not isinstance(result, Exception)}
+        errors = {key: result for key, result in results.items() if isinstance(result, Exception)}
+        return reports, errors
+
+    @handle_http_error
+    async def download_report_file(self, download_url: str, filename: str, context_description=""):
+        """Download generated report (specified by media URL) into a local file."""
+        with io.FileIO(filename, mode="wb") as out_file:
+            await self.download_report(
+                download_url=download_url, out_stream=out_file, context_description=context_description
+            )
+
+    @handle_http_error
+    async def download_report(
+        self,
+        download_url: str,
+        out_stream,
+        start_offset: int = 0,
+        compressed_transfer=False,
+        chunk_size: int = None,
+        adaptive_chunk_size=False,
+        context_description="",
+    ):
+        """Download generated report (specified by media URL) into a stream.
+
+        The report is streamed in a single request, so chunk_size and adaptive_chunk_size are not used.
+        When the stream breaks, the download is resumed from the last written byte using a Range request.
+        Writes into out_stream run in worker threads not to block the event loop.
+
+        Args:
+            download_url: URL providing report data
+            out_stream: File-like object with write method receiving the data
+            start_offset: Byte of the report where to start the download (to continue an interrupted download)
+            compressed_transfer: Request gzip content encoding, httpx decompresses the stream transparently.
+                Resumed (range) requests always ask for plain data, as the offsets are counted in plain bytes.
+            context_description: text that will be used in handle_http_error decorator
+        """
+        download = MediaStream(download_url, out_stream, start_offset, compressed_transfer)
+        started = time.monotonic()
+
+        def log_retry(error: Exception, attempt: int):
+            logging.warning(f"Download failed ({error}), resuming at byte {download.progress} (attempt {attempt})")
+
+        await self._call(
+            lambda: self._stream_media(download),
+            retry_on=(AsyncHttpError, httpx.TransportError),
+            max_tries=CHUNK_MAX_TRIES,
+            on_retry=log_retry,
+        )
+
+        elapsed = max(time.monotonic() - started, 1e-6)
+        size_mb = (download.progress - start_offset) / MEGABYTE
+        logging.info(
+            f"{context_description} - downloaded {size_mb:.1f} MB in {elapsed:.1f} s ({size_mb / elapsed:.2f} MB/s)"
+        )
+
+    async def _stream_media(self, download: MediaStream):
+        """Stream the media into the output stream, continuing at the progress of the download"""
+        headers = await self._authorization_headers()
+        if download.progress or not download.compressed_transfer:
+            headers["Accept-Encoding"] = "identity"
+        if download.progress:
+            headers["Range"] = f"bytes={download.progress}-"
+
+        async with self._http.stream("GET", download.url, headers=headers) as response:
+            if response.status_code == 416:
+                return  # nothing left to download
+            await _raise_for_status(response)
+            if download.progress and response.status_code != 206:
+                raise UserException(f"Server does not support resuming the download of {download.url}")
+            async for block in response.aiter_bytes(STREAM_BLOCK_SIZE):
+                await asyncio.to_thread(download.out_stream.write, block)
+                download.progress += len(block)
+
+
+class BlockingAsyncClient:
+    """Blocking interface of AsyncClient
+
+    The client runs in an event loop of a dedicated background thread. Methods have the same signatures
+    as methods of google_yt.client.Client and may be called from many threads concurrently.
+    """
+
+    def __init__(self, **client_parameters):
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._loop.run_forever, name="async-client", daemon=True)
+        self._thread.start()
+        self._client = self._run(self._create_client(client_parameters))
+
+    @staticmethod
+    async def _create_client(client_parameters: dict) -> AsyncClient:
+        return AsyncClient(**client_parameters)
+
+    @property
+    def rate_limiter(self) -> RateLimiter:
+        return self._client.rate_limiter
+
+    def _run(self, coroutine):
+        return asyncio.run_coroutine_threadsafe(coroutine, self._loop).result()
+
+    def close(self):
+        self._run(self._client.aclose())
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+        self._loop.close()
+
+    def list_report_types(self, *args, **kwargs):
+        return self._run(self._client.list_report_types(*args, **kwargs))
+
+    def create_job(self, *args, **kwargs):
+        return self._run(self._client.create_job(*args, **kwargs))
+
+    def delete_job(self, *args, **kwargs):
+        return self._run(self._client.delete_job(*args, **kwargs))
+
+    def create_jobs(self, *args, **kwargs):
+        return self._run(self._client.create_jobs(*args, **kwargs))
+
+    def delete_jobs(self, *args, **kwargs):
+        return self._run(self._client.delete_jobs(*args, **kwargs))
+
+    def get_jobs(self, *args, **kwargs):
+        return self._run(self._client.get_jobs(*args, **kwargs))
+
+    def list_jobs(self, *args, **kwargs):
+        return self._run(self._client.list_jobs(*args, **kwargs))
+
+    def list_reports(self, *args, **kwargs):
+        return self._run(self._client.list_reports(*args, **kwargs))
+
+    def list_reports_for_jobs(self, *args, **kwargs):
+        return self._run(self._client.list_reports_for_jobs(*args, **kwargs))
+
+    def download_report_file(self, *args, **kwargs):
+        return self._run(self._client.download_report_file(*args, **kwargs))
+
+    def download_report(self, *args, **kwargs):
+        return self._run(self._client.download_report(*args, **kwargs))
@@ -1,41 +1,204 @@
 import io
-from functools import wraps
-
-import backoff
+import json
+import logging
+import os
+import threading
+import time
+from collections.abc import Callable
+from functools import cache, wraps
+
+import httplib2
 from google.oauth2.credentials import Credentials
+from google_auth_httplib2 import AuthorizedHttp, Request
 from google_auth_oauthlib.flow import Flow
-from googleapiclient.discovery import build
+from googleapiclient.discovery import build_from_document
 from googleapiclient.errors import HttpError
-from googleapiclient.http import MediaIoBaseDownload
+from googleapiclient.http import DEFAULT_CHUNK_SIZE, MAX_BATCH_LIMIT, MediaIoBaseDownload, build_http
 from keboola.component.exceptions import UserException
 
+from .rate_limiter import DEFAULT_REQUESTS_PER_SECOND, THROTTLING_STATUS_CODES, RateLimiter, parse_retry_after
+
 SCOPES = ["https://www.googleapis.com/auth/yt-analytics-monetary.readonly"]
 API_SERVICE_NAME = "youtubereporting"
 API_VERSION = "v1"
+# Discovery document of the API pinned in the repository - the service is built offline from it
+DISCOVERY_DOCUMENT_PATH = os.path.join(os.path.dirname(__file__), f"{API_SERVICE_NAME}.{API_VERSION}.json")
+
+MEGABYTE = 1024 * 1024
+# Adaptive chunk size starts small to get first data quickly and grows while it pays off
+ADAPTIVE_INITIAL_CHUNK_SIZE = 8 * MEGABYTE
+ADAPTIVE_MIN_CHUNK_SIZE = 1 * MEGABYTE
+# Relative throughput gain required to grow the chunk size further
+ADAPTIVE_GROWTH_THRESHOLD = 1.1
+# Requests failing with a transient error are retried with exponentially growing delays
+# (unless the API tells how long to wait using Retry-After)
+REQUEST_MAX_TRIES = 5
+REQUEST_RETRY_BASE = 1.7
+REQUEST_RETRY_FACTOR = 24
+# A download of a chunk is retried more times, the download is resumed, it never starts over
+CHUNK_MAX_TRIES = 8
+MAX_RETRY_DELAY = 300
+
+
+def _is_permanent_error(error: Exception) -> bool:
+    """Client errors (except for rate limiting) are not worth retrying"""
+    status_code = getattr(error, "status_code", None)
+    return status_code is not None and status_code < 500 and status_code != 429
+
+
+def _is_throttling_error(error: Exception) -> bool:
+    return getattr(error, "status_code", None) in THROTTLING_STATUS_CODES
+
+
+def _retry_after(error: Exception) -> float | None:
+    """Delay requested by the API (Retry-After header) of a failed request, None if not given"""
+    if isinstance(error, HttpError):
+        return parse_retry_after(error.resp.get("retry-after"))
+    return getattr(error, "retry_after", None)
+
+
+def _retry_delay(attempt: int) -> float:
+    """Delay before the next attempt of a request which failed for the attempt-th time"""
+    return min(MAX_RETRY_DELAY, REQUEST_RETRY_FACTOR * REQUEST_RETRY_BASE ** (attempt - 1))
+
+
+def _http_error_exception(error: HttpError, context_description: str) -> UserException:
+    return UserException(f"{context_description} - Http error {error.status_code}: {error.reason}")
+
+
+def _start_time_filter(start_time_at_or_after: str = "", start_time_before: str = "") -> dict:
+    """Parameters of report listing restricting the data period of reports"""
+    params = dict()
+    if start_time_at_or_after:
+        params["startTimeAtOrAfter"] = start_time_at_or_after
+    if start_time_before:
+        params["startTimeBefore"] = start_time_before
+    return params
+
+
+class ReportMediaDownload(MediaIoBaseDownload):
+    """Chunked media download which may start at a byte offset
+
+    Every chunk is a range request and its offsets are counted in plain bytes, so the chunks are always
+    transferred without content encoding (compressed transfer is supported by the async client only).
+    In adaptive mode the chunk size starts at ADAPTIVE_INITIAL_CHUNK_SIZE and doubles (up to chunk_size)
+    while the throughput of chunks keeps improving. It is halved whenever a chunk fails.
+
+    MediaIoBaseDownload keeps the position of the next chunk, the chunk size and the request headers
+    in private attributes, this class is the only place relying on them.
+    """
+
+    def __init__(
+        self,
+        fd,
+        request,
+        start_offset: int = 0,
+        chunk_size: int = DEFAULT_CHUNK_SIZE,
+        adaptive_chunk_size: bool = False,
+    ):
+        super().__init__(fd, request, chunksize=chunk_size)
+        self._progress = start_offset
+        self._max_chunk_size = chunk_size
+        self._adaptive = adaptive_chunk_size
+        self._last_throughput = 0.0
+        if adaptive_chunk_size:
+            self._chunksize = min(ADAPTIVE_INITIAL_CHUNK_SIZE, chunk_size)
+        # MediaIoBaseDownload strips accept-encoding of the request, a gzip encoded range would not match
+        # the progress counted in decoded bytes
+        self._headers["accept-encoding"] = "identity"
+
+    @property
+    def progress(self) -> int:
+        """Number of bytes of the media already written to the stream"""
+        return self._progress
+
+    @property
+    def chunk_size(self) -> int:
+        return self._chunksize
+
+    def next_chunk(self, num_retries=0):
+        started = time.monotonic()
+        progress = self._progress
+        try:
+            result = super().next_chunk(num_retries=num_retries)
+        except Exception:
+            if self._adaptive:
+                self._chunksize = max(ADAPTIVE_MIN_CHUNK_SIZE, self._chunksize // 2)
+                self._last_throughput = 0.0
+            raise
+        if self._adaptive:
+            throughput = (self._progress - progress) / max(time.monotonic() - started, 1e-6)
+            if throughput > self._last_throughput * ADAPTIVE_GROWTH_THRESHOLD:
+                self._chunksize = min(self._max_chunk_size, self._chunksize * 2)
+            self._last_throughput = throughput
+        return result
+
+
+@cache
+def load_discovery_document() -> dict:
+    """Load the pinned discovery document (parsed only once per process)"""
+    with open(DISCOVERY_DOCUMENT_PATH) as document:
+        return json.load(document)
+
+
+def build_credentials(
+    access_token: str = None, client_id: str = None, app_secret: str = None, token_data: dict = None
+) -> Credentials:
+    """Create OAuth credentials either from an explicit access token or from OAuth token data
+
+    Credentials created from token data are always refreshed (using refresh token) on first use.
+    """
+    if access_token:
+        return Credentials(token=access_token)
+    client_secrets = {
+        "web": {
+            "client_id": client_id,
+            "client_secret": app_secret,
+            "auth_uri": "https://oauth2.googleapis.com/auth",
+            "token_uri": "https://oauth2.googleapis.com/token",
+        }
+    }
+    # make sure the token is expired explicitly to force refresh
+    token_data["expires_at"] = 0
+    return Flow.from_client_config(client_secrets, scopes=SCOPES, token=token_data).credentials
 
 
 class Client:
+    """Client of the YouTube Reporting API
+
+    The client is thread-safe. Httplib2 transport must not be shared by threads, so every request is executed
+    using an authorized transport of the calling thread. Transports are reused by subsequent calls of the same
+    thread and all of them share a single credentials object, whose token is refreshed once for all threads.
+
+    All requests of all threads pass a shared rate limiter and transient failures are retried in one place
+    (see _call), so quota pressure signalled by the API slows down all workers together.
+    """
+
     def __init__(
-        self, access_token: str = None, client_id: str = None, app_secret: str = None, token_data: dict = None
+        self,
+        access_token: str = None,
+        client_id: str = None,
+        app_secret: str = None,
+        token_data: dict = None,
+        requests_per_second: float = DEFAULT_REQUESTS_PER_SECOND,
     ):
-        self.service = None
-        if access_token:
-            credentials = Credentials(token=access_token)
-            pass
-        else:
-            client_secrets = {
-                "web": {
-                    "client_id": client_id,
-                    "client_secret": app_secret,
-                    "auth_uri": "https://oauth2.googleapis.com/auth",
-                    "token_uri": "https://oauth2.googleapis.com/token",
-                }
-            }
-            # make sure the token is expired explicitly to force refresh
-            token_data["expires_at"] = 0
-            credentials = Flow.from_client_config(client_secrets, scopes=SCOPES, token=token_data).credentials
-        self.service = build(serviceName=API_SERVICE_NAME, version=API_VERSION, credentials=credentials)
-        pass
+        self._credentials = build_credentials(access_token, client_id, app_secret, token_data)
+        self.rate_limiter = RateLimiter(requests_per_second)
+        self._token_lock = threading.Lock()
+        self._thread_local = threading.local()
+        self.service = build_from_document(load_discovery_document(), credentials=self._credentials)
+
+    @property
+    def http(self) -> AuthorizedHttp:
+        """Authorized transport of the calling thread, with a valid access token"""
+        with self._token_lock:
+            if not self._credentials.valid:
+                self._credentials.refresh(Request(build_http()))
+        http = getattr(self._thread_local, "http", None)
+        if http is None:
+            http = AuthorizedHttp(self._credentials, http=build_http())
+            self._thread_local.http = http
+        return http
 
     @staticmethod
     def handle_http_error(func):
@@ -55,7 +218,7 @@ class Client:
                 result = func(self, *args, **kwargs)
                 return result
             except HttpError as error:
-                raise UserException(f"{context_description} - Http error {error.status_code}: {error.reason}")
+                raise _http_error_exception(error, context_description)
             except Exception:
                 raise
 
@@ -77,7 +240,7 @@ class Client:
             kwargs["onBehalfOfContentOwner"] = on_behalf_of_owner
         if include_system_managed:
             kwargs["includeSystemManaged"] = include_system_managed
-        results = self.service.reportTypes().list(**kwargs).execute()
+        results = self._execute(self.service.reportTypes().list(**kwargs))
         return results.get("reportTypes")
 
     @handle_http_error
@@ -116,7 +279,7 @@ class Client:
         if on_behalf_of_owner:
             kwargs["onBehalfOfContentOwner"] = on_behalf_of_owner
 
-        results = self.service.jobs().create(body=body, **kwargs).execute()
+        results = self._execute(self.service.jobs().create(body=body, **kwargs))
         return results
 
     @handle_http_error
@@ -134,16 +297,104 @@ class Client:
         if on_behalf_of_owner:
             kwargs["onBehalfOfContentOwner"] = on_behalf_of_owner
         try:
-            self.service.jobs().delete(jobId=job_id, **kwargs).execute()
+            self._execute(self.service.jobs().delete(jobId=job_id, **kwargs))
         except HttpError as ex:
             # we allow for non-existent job, other errors will be propagated
             if ex.status_code != 404:
                 raise
         return
 
+    @handle_http_error
+    def create_jobs(self, job_names: dict, on_behalf_of_owner="", context_description=""):
+        """Create jobs for several report types using batch requests (see create_job)
+
+        Args:
+            job_names: mapping of report_type_id to the name of a job to create
+            on_behalf_of_owner: If specified then specific channel owner reports will be listed
+            context_description: text used in error messages, the report type ID of a failed job is appended
+
+        Returns:
+            Mapping of report_type_id to created job resource
+
+        Raises:
+            UserException listing all jobs that could not be created
+        """
+        kwargs = dict()
+        if on_behalf_of_owner:
+            kwargs["onBehalfOfContentOwner"] = on_behalf_of_owner
+        requests = {
+            report_type_id: self.service.jobs().create(body={"name": name, "reportTypeId": report_type_id}, **kwargs)
+            for report_type_id, name in job_names.items()
+        }
+        results = self._execute_batch(requests)
+        errors = [
+            _http_error_exception(result, f"{context_description} for {report_type_id}")
+            for report_type_id, result in results.items()
+            if isinstance(result, HttpError)
+        ]
+        if errors:
+            raise UserException("; ".join(str(error) for error in errors))
+        return results
+
+    @handle_http_error
+    def delete_jobs(self, job_ids: dict, on_behalf_of_owner="", context_description=""):
+        """Delete existing jobs using batch requests, non-existent job is not an error (see delete_job)
+
+        Args:
+            job_ids: mapping of a key (report_type_id) to ID of a job to delete
+            on_behalf_of_owner: If specified then specific channel owner reports will be listed
+            context_description: text used in error messages, the key of a failed job is appended
+
+        Raises:
+            UserException listing all jobs that could not be deleted
+        """
+        kwargs = {}
+        if on_behalf_of_owner:
+            kwargs["onBehalfOfContentOwner"] = on_behalf_of_owner
+        requests = {key: self.service.jobs().delete(jobId=job_id, **kwargs) for key, job_id in job_ids.items()}
+        results = self._execute_batch(requests)
+        errors = [
+            _http_error_exception(result, f"{context_description} for {key}")
+            for key, result in results.items()
+            if isinstance(result, HttpError) and result.status_code != 404
+        ]
+        if errors:
+            raise UserException("; ".join(str(error) for error in errors))
+
+    @handle_http_error
+    def get_jobs(self, job_ids: dict, on_behalf_of_owner="", context_description=""):
+        """Look up existing jobs by their IDs using batch requests
+
+        Uses API: https://developers.google.com/youtube/reporting/v1/reference/rest/v1/jobs/get
+
+        Args:
+            job_ids: mapping of a key (report_type_id) to ID of a job
+            on_behalf_of_owner: If specified then jobs of specific content owner are looked up
+            context_description: text used in error messages, the key of a failed job is appended
+
+        Returns:
+            Mapping of the key to job resource, jobs that do not exist are left out
+
+        Raises:
+            UserException listing all lookups that failed (except for non-existent jobs)
+        """
+        kwargs = {}
+        if on_behalf_of_owner:
+            kwargs["onBehalfOfContentOwner"] = on_behalf_of_owner
+        requests = {key: self.service.jobs().get(jobId=job_id, **kwargs) for key, job_id in job_ids.items()}
+        results = self._execute_batch(requests)
+        errors = [
+            _http_error_exception(result, f"{context_description} for {key}")
+            for key, result in results.items()
+            if isinstance(result, HttpError) and result.status_code != 404
+        ]
+        if errors:
+            raise UserException("; ".join(str(error) for error in errors))
+        return {key: result for key, result in results.items() if not isinstance(result, HttpError)}
+
     @handle_http_error
     def list_jobs(self, on_behalf_of_owner: str = "", include_system_managed=False, context_description=""):
-        """List jobs
+        """List jobs (all pages)
 
         Uses API: https://developers.google.com/youtube/reporting/v1/reference/rest/v1/jobs/list
 
@@ -171,12 +422,26 @@ class Client:
         if include_system_managed:
             kwargs["includeSystemManaged"] = include_system_managed
 
-        results = self.service.jobs().list(**kwargs).execute()
-        return results.get("jobs", [])
+        jobs = []
+        while True:
+            results = self._execute(self.service.jobs().list(**kwargs))
+            jobs.extend(results.get("jobs", []))
+            if "nextPageToken" not in results:
+                break  # There are no more data, leave the loop
+            kwargs["pageToken"] = results["nextPageToken"]
+
+        return jobs
 
     @handle_http_error
-    @backoff.on_exception(backoff.expo, HttpError, jitter=None, max_tries=3, base=1.7, factor=24)
-    def list_reports(self, job_id: str, on_behalf_of_owner: str = "", created_after: str = "", context_description=""):
+    def list_reports(
+        self,
+        job_id: str,
+        on_behalf_of_owner: str = "",
+        created_after: str = "",
+        start_time_at_or_after: str = "",
+        start_time_before: str = "",
+        context_description="",
+    ):
         """List reports associated with specified job
 
         Uses API: https://developers.google.com/youtube/reporting/v1/reference/rest/v1/jobs.reports/list
@@ -187,6 +452,8 @@ class Client:
                 If not specified then current user channel reports will be listed.
             created_after: Filter only reports newer than specified date.
                 It is the best practice to specify value of createTime of latest retrieved report.
+            start_time_at_or_after: Filter only reports whose data period starts at or after specified timestamp.
+            start_time_before: Filter only reports whose data period starts before specified timestamp.
             context_description: text that will be used in handle_http_error decorator
 
         Returns:
@@ -209,9 +476,10 @@ class Client:
             kwargs["onBehalfOfContentOwner"] = on_behalf_of_owner
         if created_after:
             kwargs["createdAfter"] = created_after
+        kwargs.update(_start_time_filter(start_time_at_or_after, start_time_before))
         reports = []
         while True:
-            results = self.service.jobs().reports().list(jobId=job_id, **kwargs).execute()
+            results = self._execute(self.service.jobs().reports().list(jobId=job_id, **kwargs))
             if "reports" not in results:
                 break  # if there were no reports yet, there is no reports list at all
             reports.extend(results["reports"])
@@ -221,23 +489,218 @@ class Client:
 
         return reports
 
+    @handle_http_error
+    def list_reports_for_jobs(
+        self,
+        jobs: dict,
+        on_behalf_of_owner: str = "",
+        start_time_at_or_after: str = "",
+        start_time_before: str = "",
+        context_description="",
+    ):
+        """List reports of several jobs using batch requests (see list_reports)
+
+        All jobs are listed at once, the next pages of jobs with more reports are requested in following batches.
+        A failure of one job does not affect the others.
+
+        Args:
+            jobs: mapping of a key (report_type_id) to a tuple of job ID and created_after filter (may be empty)
+            on_behalf_of_owner: If specified then specific channel owner reports will be listed.
+            start_time_at_or_after: Filter only reports whose data period starts at or after specified timestamp.
+            start_time_before: Filter only reports whose data period starts before specified timestamp.
+            context_description: text used in error messages, the key of a failed job is appended
+
+        Returns:
+            Mapping of the key to a list of reports for successfully listed jobs
+            and mapping of the key to UserException for jobs that failed
+        """
+        kwargs = dict()
+        if on_behalf_of_owner:
+            kwargs["onBehalfOfContentOwner"] = on_behalf_of_owner
+        kwargs.update(_start_time_filter(start_time_at_or_after, start_time_before))
+        pending = dict()
+        for key, (job_id, created_after) in jobs.items():
+            pending[key] = dict(kwargs, jobId=job_id, **({"createdAfter": created_after} if created_after else {}))
+
+        reports = {key: [] for key in jobs}
+        errors = dict()
+        while pending:
+            requests = {key: self.service.jobs().reports().list(**params) for key, params in pending.items()}
+            results = self._execute_batch(requests)
+            for key, result in results.items():
+                if isinstance(result, HttpError):
+                    errors[key] = _http_error_exception(result, f"{context_description} for {key}")
+                    del reports[key]
+                    del pending[key]
+                    continue
+                reports[key].extend(result.get("reports", []))
+                if "nextPageToken" in result:
+                    pending[key]["pageToken"] = result["nextPageToken"]
+                else:
+                    del pending[key]
+
+        return reports, errors
+
     @handle_http_error
     def download_report_file(self, download_url: str, filename: str, context_description=""):
         """Download generated report (specified by media URL) into a local file.
 
-        GCP library provides dedicated method to download a stream of data into a local file.
-
         Args:
             download_url: URL providing report data
             filename: Target file where to write the data
             context_description: text that will be used in handle_http_error decorator
         """
+        with io.FileIO(filename, mode="wb") as out_file:
+            self.download_report(
+                download_url=download_url, out_stream=out_file, context_description=context_description
+            )
+
+    @handle_http_error
+    def download_report(
+        self,
+        download_url: str,
+        out_stream,
+        start_offset: int = 0,
+        compressed_transfer=False,
+        chunk_size: int = DEFAULT_CHUNK_SIZE,
+        adaptive_chunk_size=False,
+        context_description="",
+    ):
+        """Download generated report (specified by media URL) into a stream.
+
+        GCP library provides dedicated method to download a stream of data chunk by chunk (using Range requests).
+        Each chunk is written into the stream as soon as it is received. When a chunk fails, the download
+        is resumed from the last written byte, it never starts over.
+
+        Args:
+            download_url: URL providing report data
+            out_stream: File-like object with write method receiving the data
+            start_offset: Byte of the report where to start the download (to continue an interrupted download)
+            compressed_transfer: Not supported - chunks are range requests counted in plain bytes, they are
+                always transferred without content encoding (the parameter is kept for AsyncClient compatibility)
+            chunk_size: Number of bytes requested at once (maximum chunk size in adaptive mode)
+            adaptive_chunk_size: Adjust chunk size according to achieved throughput (see ReportMediaDownload)
+            context_description: text that will be used in handle_http_error decorator
+        """
         request = self.service.media().download_media(resourceName="")
         request.uri = download_url
+        request.http = self.http
+
+        downloader = ReportMediaDownload(
+            out_stream,
+            request,
+            start_offset=start_offset,
+            chunk_size=chunk_size,
+            adaptive_chunk_size=adaptive_chunk_size,
+        )
+        started = time.monotonic()
+        download_finished = False
+        while download_finished is False:
+            _, download_finished = self._next_chunk(downloader)
+
+        elapsed = max(time.monotonic() - started, 1e-6)
+        size_mb = (downloader.progress - start_offset) / MEGABYTE
+        logging.info(
+            f"{context_description} - downloaded {size_mb:.1f} MB in {elapsed:.1f} s ({size_mb / elapsed:.2f} MB/s)"
+        )
+
+    def _next_chunk(self, downloader: ReportMediaDownload):
+        """Download next chunk of media, a failed chunk is retried starting at the last written byte"""
+
+        def log_retry(error: Exception, attempt: int):
+            logging.warning(
+                f"Download of a chunk failed ({error}), resuming at byte {downloader.progress} "
+                f"with chunk size {downloader.chunk_size} (attempt {attempt})"
+            )
+
+        return self._call(
+            downloader.next_chunk,
+            retry_on=(HttpError, httplib2.HttpLib2Error, OSError),
+            max_tries=CHUNK_MAX_TRIES,
+            on_retry=log_retry,
+        )
+
+    def _call(
+        self,
+        call: Callable,
+        tokens: int = 1,
+        retry_on: tuple = (HttpError,),
+        max_tries: int = REQUEST_MAX_TRIES,
+        on_retry: Callable = None,
+    ):
+        """Call the API through the rate limiter, calls failing with a transient error are retried
 
-        with io.FileIO(filename, mode="wb") as out_file:
-            downloader = MediaIoBaseDownload(out_file, request)
-            download_finished = False
-            while download_finished is False:
-                _, download_finished = downloader.next_chunk(num_retries=60)
-            pass
+        Client errors (except for rate limiting) are raised immediately. On quota pressure (429, 503)
+        the rate limiter slows down requests of all threads and pauses them for the time requested
+        by the API (Retry-After), other failures are retried after an exponentially growing delay.
+
+        Args:
+            call: function sending the request(s), called without arguments
+            tokens: number of API calls made by the function (sub-requests of a batch)
+            retry_on: exceptions considered as a failure of the request
+            max_tries: maximum number of attempts
+            on_retry: function called with the error and the attempt number before the call is retried
+        """
+        for attempt in range(1, max_tries + 1):
+            self.rate_limiter.acquire(tokens)
+            try:
+                return call()
+            except retry_on as error:
+                if attempt == max_tries or _is_permanent_error(error):
+                    raise
+                if on_retry:
+                    on_retry(error, attempt)
+                self._back_off(error, attempt)
+
+    def _back_off(self, error: Exception, attempt: int):
+        """Wait before the next attempt of a failed request (see _call)"""
+        retry_after = _retry_after(error)
+        if _is_throttling_error(error):
+            self.rate_limiter.slow_down(retry_after)
+            if retry_after is not None:
+                # the rate limiter holds the request (and all others) for the requested time
+                return
+        time.sleep(retry_after if retry_after is not None else _retry_delay(attempt))
+
+    def _execute(self, request):
+        """Execute a single API request (see _call)"""
+        return self._call(lambda: request.execute(http=self.http))
+
+    def _execute_batch(self, requests: dict) -> dict:
+        """Execute requests grouped into batch requests of at most MAX_BATCH_LIMIT calls
+
+        Calls failing with a transient error (server error, rate limiting) are retried in another batch.
+        Each call of a batch takes a token of the rate limiter (see _call).
+
+        Args:
+            requests: mapping of a key to HttpRequest
+
+        Returns:
+            Mapping of the key to the response of the call or to HttpError if the call failed
+        """
+        results = dict()
+
+        def store_result(key):
+            def callback(request_id, response, exception):
+                results[key] = exception if exception is not None else response
+
+            return callback
+
+        pending = list(requests)
+        for attempt in range(1, REQUEST_MAX_TRIES + 1):
+            for start in range(0, len(pending), MAX_BATCH_LIMIT):
+                batch = self.service.new_batch_http_request()
+                keys = pending[start : start + MAX_BATCH_LIMIT]
+                for key in keys:
+                    batch.add(requests[key], callback=store_result(key))
+                self._call(lambda: batch.execute(http=self.http), tokens=len(keys))
+            failed = [
+                key for key in pending if isinstance(results[key], HttpError) and not _is_permanent_error(results[key])
+            ]
+            if not failed or attempt == REQUEST_MAX_TRIES:
+                break
+            logging.warning(f"{len(failed)} batched requests failed, retrying")
+            # the failure asking for the longest delay represents the batch
+            self._back_off(max((results[key] for key in failed), key=lambda error: _retry_after(error) or 0), attempt)
+            pending = failed
+        return results
@@ -0,0 +1,113 @@
+"""
+Rate limiter shared by all requests of an API client.
+
+Requests of all worker threads (and coroutines of the async client) take tokens from a single token bucket,
+so the request rate of the whole component is bounded. When the API signals quota pressure (429 or 503),
+the rate is halved for all requests and, if the response tells how long to wait (Retry-After),
+no request is sent until then. The rate recovers gradually while there is no more pressure.
+"""
+
+import asyncio
+import logging
+import threading
+import time
+from email.utils import parsedate_to_datetime
+
+DEFAULT_REQUESTS_PER_SECOND = 10.0
+# The rate is never reduced below this fraction of the configured rate
+MIN_RATE_FRACTION = 1 / 16
+# Seconds without quota pressure after which a reduced rate is doubled
+RECOVERY_INTERVAL = 60.0
+# Status codes of responses signalling quota pressure
+THROTTLING_STATUS_CODES = (429, 503)
+
+
+def parse_retry_after(value: str | None) -> float | None:
+    """Seconds to wait according to a Retry-After header (delay in seconds or HTTP date), None if not given"""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+class RateLimiter:
+    """Thread-safe token bucket
+
+    A caller reserves tokens and waits until the reservation is due, so the waiting callers are served
+    in the order of their reservations and none of them holds a lock while waiting.
+
+    Args:
+        requests_per_second: Maximum sustained rate of requests, 0 for no limit (pauses are still honored)
+        burst: Number of requests that may be sent at once after a quiet period, the rate (at least 1) by default
+    """
+
+    def __init__(self, requests_per_second: float = DEFAULT_REQUESTS_PER_SECOND, burst: float = None):
+        self.max_rate = requests_per_second
+        self.rate = requests_per_second
+        self.burst = burst or max(1.0, requests_per_second)
+        self._tokens = self.burst
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._last_pressure = 0.0
+        # number of quota pressure events, observed by the download concurrency controller
+        self.pressure_count = 0
+        self._lock = threading.Lock()
+
+    def reserve(self, tokens: float = 1) -> float:
+        """Take tokens for a request, returns the number of seconds to wait before sending it
+
+        Requests costing more than the burst (e.g. large batches, quota is counted per sub-request) are sent
+        as soon as the whole burst is available and are charged in full, the following requests wait
+        until the deficit is refilled.
+        """
+        with self._lock:
+            now = time.monotonic()
+            if not self.max_rate:
+                return max(0.0, self._paused_until - now)
+            if self.rate < self.max_rate and now - self._last_pressure >= RECOVERY_INTERVAL:
+                self.rate = min(self.max_rate, self.rate * 2)
+                self._last_pressure = now
+            if now > self._updated:
+                self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+            self._tokens -= tokens
+            # missing tokens are refilled since the last update (which is the end of a pause at the latest),
+            # the cost beyond the burst is left to the following requests
+            deficit = -(self._tokens + max(0.0, tokens - self.burst))
+            return max(0.0, self._updated + max(0.0, deficit) / self.rate - now)
+
+    def acquire(self, tokens: float = 1):
+        """Wait until a request may be sent"""
+        wait = self.reserve(tokens)
+        if wait > 0:
+            time.sleep(wait)
+
+    async def acquire_async(self, tokens: float = 1):
+        """Wait until a request may be sent, without blocking the event loop"""
+        wait = self.reserve(tokens)
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+    def slow_down(self, retry_after: float = None):
+        """Quota pressure signalled by the API - reduce the rate and pause all requests for retry_after seconds"""
+        with self._lock:
+            now = time.monotonic()
+            self._last_pressure = now
+            self.pressure_count += 1
+            if self.max_rate:
+                self.rate = max(self.max_rate * MIN_RATE_FRACTION, self.rate / 2)
+            if retry_after:
+                self._paused_until = max(self._paused_until, now + retry_after)
+                # tokens are not accumulated during the pause, requests continue at the reduced rate
+                self._tokens = min(self._tokens, 0.0)
+                self._updated = max(self._updated, self._paused_until)
+        logging.warning(
+            f"API quota pressure, slowing down to {self.rate:.2f} requests/s"
+            + (f", pausing requests for {retry_after:.0f} s" if retry_after else "")
+        )
@@ -0,0 +1,68 @@
+"""
+Catalog of reporting jobs of a channel or content owner.
+
+The API does not prevent several jobs of the same report type (e.g. created by other tools),
+so the catalog indexes all listed jobs by report type and resolves duplicates deterministically.
+"""
+
+import logging
+
+
+class JobCatalog:
+    """Jobs indexed by report type
+
+    When there are more jobs of a report type, the job known from the state is preferred,
+    otherwise the oldest one (by createTime) is used.
+
+    Args:
+        jobs: jobs as returned by list_jobs
+    """
+
+    def __init__(self, jobs: list):
+        self._jobs_by_id = dict()
+        self._jobs_by_type = dict()
+        for job in sorted(jobs, key=lambda x: x.get("createTime", "")):
+            self.add(job)
+        for report_type_id, duplicates in self.duplicates.items():
+            logging.warning(
+                f"There are {len(duplicates)} jobs of report type {report_type_id}: "
+                f"{', '.join(job['id'] for job in duplicates)}"
+            )
+
+    def __contains__(self, report_type_id: str) -> bool:
+        return report_type_id in self._jobs_by_type
+
+    @property
+    def duplicates(self) -> dict:
+        """Mapping of report_type_id to all its jobs, for report types having more than one job"""
+        return {report_type_id: jobs for report_type_id, jobs in self._jobs_by_type.items() if len(jobs) > 1}
+
+    def get(self, report_type_id: str, preferred_id: str = None) -> dict | None:
+        """Job of the report type, None if there is none
+
+        Args:
+            report_type_id: ID of a report type
+            preferred_id: ID of the job to use if there are more jobs of the report type (e.g. the job from state)
+        """
+        jobs = self._jobs_by_type.get(report_type_id)
+        if not jobs:
+            return None
+        return next((job for job in jobs if job["id"] == preferred_id), jobs[0])
+
+    def has_job(self, job_id: str) -> bool:
+        return job_id in self._jobs_by_id
+
+    def add(self, job: dict):
+        """Add a job (e.g. a newly created one)"""
+        self._jobs_by_id[job["id"]] = job
+        self._jobs_by_type.setdefault(job["reportTypeId"], []).append(job)
+
+    def remove(self, job_id: str):
+        """Remove a deleted job"""
+        job = self._jobs_by_id.pop(job_id, None)
+        if job is None:
+            return
+        jobs = self._jobs_by_type[job["reportTypeId"]]
+        jobs.remove(job)
+        if not jobs:
+            del self._jobs_by_type[job["reportTypeId"]]
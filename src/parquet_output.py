@@ -0,0 +1,109 @@
+"""
+Parquet output of report data.
+
+Instead of a header-less CSV slice, the rows of a report period may be written as a Parquet file with a typed
+schema. Types are assigned by the report_types registry: dimensions are strings (except for the date dimension),
+metrics are numeric. CSV rows are buffered and converted into row groups of bounded size, so the memory used
+by a download does not depend on the size of the report.
+"""
+
+import io
+
+import pyarrow as pa
+import pyarrow.csv as pa_csv
+import pyarrow.parquet as pq
+
+from report_types import report_types
+
+# Amount of CSV data converted into one row group
+ROW_GROUP_BYTES = 64 * 1024 * 1024
+PARQUET_COMPRESSION = "snappy"
+# Date dimension of reports (formatted YYYYMMDD)
+DATE_COLUMN = "date"
+
+
+def column_types(report_type_id: str) -> dict:
+    """Arrow types of known columns of a report type, other columns are strings"""
+    report_type = report_types.get(report_type_id, {"dimensions": [], "metrics": []})
+    types = {column: pa.string() for column in report_type["dimensions"]}
+    types.update({column: pa.float64() for column in report_type["metrics"]})
+    if DATE_COLUMN in types:
+        types[DATE_COLUMN] = pa.date32()
+    return types
+
+
+class ParquetOutput:
+    """Binary file-like object converting CSV rows (without header) into a Parquet file
+
+    Columns of the rows have to be set before the first write. Every write has to consist of complete rows.
+    The file is written when the first row group is complete or when the output is closed.
+
+    Args:
+        filename: Destination Parquet file
+        types: Arrow types of columns by name (see column_types), other columns are strings
+        row_group_bytes: Amount of CSV data buffered for one row group
+    """
+
+    def __init__(self, filename: str, types: dict = None, row_group_bytes: int = ROW_GROUP_BYTES):
+        self.filename = filename
+        self.types = types or dict()
+        self.row_group_bytes = row_group_bytes
+        self.columns = None
+        self.closed = False
+        self._buffer = []
+        self._buffered_bytes = 0
+        self._writer = None
+        self._schema = None
+
+    def set_columns(self, columns: list):
+        self.columns = list(columns)
+        self._schema = pa.schema([(column, self.types.get(column, pa.string())) for column in self.columns])
+
+    def write(self, rows: bytes) -> int:
+        if not rows:
+            return 0
+        if self.columns is None:
+            raise ValueError("Columns of the Parquet output are not set")
+        self._buffer.append(bytes(rows))
+        self._buffered_bytes += len(rows)
+        if self._buffered_bytes >= self.row_group_bytes:
+            self._flush()
+        return len(rows)
+
+    def close(self):
+        if self.closed:
+            return
+        self.closed = True
+        if self.columns is None:
+            return  # no header was received, there is no data
+        self._flush()
+        if self._writer is None:
+            # report without rows - an empty file with the schema
+            self._writer = pq.ParquetWriter(self.filename, self._schema, compression=PARQUET_COMPRESSION)
+        self._writer.close()
+
+    def _flush(self):
+        if not self._buffer:
+            return
+        data = b"".join(self._buffer)
+        self._buffer = []
+        self._buffered_bytes = 0
+        table = self._convert(data)
+        if self._writer is None:
+            self._writer = pq.ParquetWriter(self.filename, self._schema, compression=PARQUET_COMPRESSION)
+        self._writer.write_table(table)
+
+    def _convert(self, data: bytes) -> pa.Table:
+        """Parse CSV rows into a table of the schema (dates of reports are formatted YYYYMMDD)"""
+        read_types = {
+            column: pa.timestamp("s") if pa.types.is_date32(column_type) else column_type
+            for column, column_type in zip(self._schema.names, self._schema.types)
+        }
+        table = pa_csv.read_csv(
+            io.BytesIO(data),
+            read_options=pa_csv.ReadOptions(column_names=self.columns),
+            convert_options=pa_csv.ConvertOptions(
+                column_types=read_types, timestamp_parsers=["%Y%m%d"], strings_can_be_null=False
+            ),
+        )
+        return table.cast(self._schema)
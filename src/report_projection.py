@@ -0,0 +1,79 @@
+"""
+Column projection and row filtering of report data.
+
+Reports come with all metrics of a report type and with rows of all channels, countries etc.
+A projection configured for a report type keeps only the selected columns in the output table (columns
+of the primary key - the dimensions - are always kept) and only rows satisfying simple predicates.
+It is applied to complete rows while the report is streamed into the table slice, the raw report file
+is kept unchanged.
+"""
+
+import csv
+import io
+
+# Supported operators of row filters
+FILTER_OPERATORS = ("in", "not_in")
+
+
+class ReportProjection:
+    """Selected columns and row predicates of a report type
+
+    Args:
+        key_columns: Columns always kept in the output (primary key of the table)
+        columns: Other columns to keep, all columns are kept if empty
+        filters: (column, operator, values) tuples, a row is kept if it satisfies all of them.
+            Operator "in" requires the value of the column to be one of values, "not_in" requires the opposite.
+    """
+
+    def __init__(self, key_columns: list, columns: list = None, filters: list = None):
+        self.key_columns = list(key_columns)
+        self.columns = list(columns or [])
+        self.filters = list(filters or [])
+        for _, operator, _ in self.filters:
+            if operator not in FILTER_OPERATORS:
+                raise ValueError(f"Unsupported row filter operator: {operator}")
+
+    def output_columns(self, columns: list) -> list:
+        """Columns of the output table for a report with given columns (in the order of the report)"""
+        if not self.columns:
+            return list(columns)
+        return [column for column in columns if column in self.key_columns or column in self.columns]
+
+    def projector(self, columns: list) -> "RowProjector":
+        """Projector of rows of a report with given columns"""
+        return RowProjector(self, columns)
+
+
+class RowProjector:
+    """Applies a projection to CSV rows of a report with known columns (see ReportProjection)
+
+    Filters on columns the report does not have are not satisfied by any row.
+    """
+
+    def __init__(self, projection: ReportProjection, columns: list):
+        positions = {column: position for position, column in enumerate(columns)}
+        self._positions = [positions[column] for column in projection.output_columns(columns)]
+        self._all_columns = len(self._positions) == len(columns)
+        self._predicates = []
+        for column, operator, values in projection.filters:
+            self._predicates.append((positions.get(column), operator == "in", frozenset(values)))
+
+    def _keep(self, row: list) -> bool:
+        for position, included, values in self._predicates:
+            if position is None or position >= len(row):
+                return False
+            if (row[position] in values) is not included:
+                return False
+        return True
+
+    def apply(self, rows: bytes) -> bytes:
+        """Project complete CSV rows (UTF-8 encoded), the kept rows are terminated by a line feed"""
+        output = io.StringIO()
+        writer = csv.writer(output, lineterminator="\n")
+        for row in csv.reader(io.StringIO(bytes(rows).decode("utf-8"))):
+            if not self._keep(row):
+                continue
+            if not self._all_columns:
+                row = [row[position] if position < len(row) else "" for position in self._positions]
+            writer.writerow(row)
+        return output.getvalue().encode("utf-8")
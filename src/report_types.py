@@ -1,8 +1,8 @@
 """
 Each output table is associated with a specific report type ID.
 Here were prepared a structure listing dimensions a metrics that appear in specific report type ID.
-We currently use only 'dimensions' list to specify which columns compose a primary key of the table.
-The 'metrics' list are not used. We have it here only for completion.
+We use 'dimensions' list to specify which columns compose a primary key of the table.
+Columns of both lists may be selected (and rows filtered) in report type settings of the configuration.
 
 Information on dimensions and metrics for individual report type IDs was retrieved from documentation found here:
 - https://developers.google.com/youtube/reporting/v1/reports/channel_reports
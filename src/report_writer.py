@@ -0,0 +1,270 @@
+"""
+Streaming writer of downloaded reports.
+
+Report data arrive from the API as a stream of chunks of a CSV file with a header line.
+ReportWriter consumes the chunks as they come, captures the header line (used for the output table manifest)
+and writes the rest of the data directly into a header-less slice of the output table.
+Optionally the original report (including the header) is kept as a raw file as well.
+Both the slice and the raw file may be written compressed.
+A projection (selected columns, row filters) may be applied to the rows of the slice, the raw file stays unchanged.
+Instead of a CSV slice, the rows may be written into a typed Parquet file (see parquet_output).
+A hash of the report content is computed on the fly, so that regenerated reports can be compared with loaded ones.
+A large report may be split into more slices of bounded size or number of rows, so that storage loads them
+in parallel. The first rows of the slice are kept as a sample for the detection of column types (see column_metadata).
+"""
+
+import csv
+import gzip
+import hashlib
+import io
+import os
+
+import zstandard
+
+from column_metadata import SAMPLE_BYTES
+from parquet_output import ParquetOutput
+from report_projection import ReportProjection
+
+# Supported compressions of output files and extensions appended to the file names
+COMPRESSION_EXTENSIONS = {"none": "", "gzip": ".gz", "zstd": ".zst"}
+# Compressions supported by Keboola storage for table slices
+TABLE_COMPRESSIONS = ("none", "gzip")
+# Formats of the table slices
+OUTPUT_FORMATS = ("csv", "parquet")
+# Compression levels balancing the output size and the CPU cost on the download path
+GZIP_COMPRESS_LEVEL = 6
+ZSTD_COMPRESS_LEVEL = 3
+# Size of the report content digest in bytes (it is kept in the state for every report period)
+CONTENT_HASH_SIZE = 16
+
+
+def open_output(filename: str, compression: str = "none"):
+    """Open binary output file using specified compression
+
+    Args:
+        filename: Destination file name (including extension of the compression)
+        compression: One of COMPRESSION_EXTENSIONS keys
+    """
+    if compression == "gzip":
+        return gzip.open(filename, mode="wb", compresslevel=GZIP_COMPRESS_LEVEL)
+    if compression == "zstd":
+        return zstandard.ZstdCompressor(level=ZSTD_COMPRESS_LEVEL).stream_writer(open(filename, mode="wb"))
+    if compression == "none":
+        return open(filename, mode="wb")
+    raise ValueError(f"Unsupported compression: {compression}")
+
+
+class ReportWriter(io.RawIOBase):
+    """File-like object splitting a downloaded report into header columns and a header-less table slice
+
+    Only complete rows are written to the output files, an incomplete trailing row is held back until the rest
+    of it arrives. So when a download is interrupted, the slice ends at a row boundary and `offset` tells
+    the byte of the report where the download has to continue.
+    The held back data are written when the writer is used as a context manager that exits without an error.
+    `content_hash` is a digest of the whole report (including the header), it is not known for a download
+    continuing at a start offset. `offset` and `content_hash` always refer to the original report,
+    even if a projection changes the rows of the slice.
+    `sample` holds complete rows from the start of the slice data (after the projection), up to SAMPLE_BYTES.
+    When a slice reaches max_slice_bytes or max_slice_rows, the following rows are written into a new slice
+    named after the first one with a part number (`2023-07-29T07_00_00Z_part2.csv`), a slice always ends
+    at a row boundary. A single row larger than max_slice_bytes forms a slice of its own. `slice_filenames`
+    lists the slice files written.
+
+    Args:
+        slice_filename: Destination file of the table slice (data without header line)
+        raw_filename: Optional destination of the original report file
+        compression: Compression of the table slice (CSV only, Parquet files use their internal compression)
+        raw_compression: Compression of the raw file
+        start_offset: Byte of the report where the data start, when continuing an interrupted download
+        columns: Columns of the report, required when continuing an interrupted download (there is no header)
+        projection: Columns and rows of the report to keep in the slice, all of them if None
+        output_format: Format of the slice, one of OUTPUT_FORMATS
+        column_types: Arrow types of columns of a Parquet slice (see parquet_output.column_types)
+        max_slice_bytes: Size of the slice data (uncompressed) starting a new slice, 0 for no limit
+        max_slice_rows: Number of rows of a slice starting a new slice, 0 for no limit
+    """
+
+    def __init__(
+        self,
+        slice_filename: str,
+        raw_filename: str = None,
+        compression: str = "none",
+        raw_compression: str = "none",
+        start_offset: int = 0,
+        columns: list = None,
+        projection: ReportProjection = None,
+        output_format: str = "csv",
+        column_types: dict = None,
+        max_slice_bytes: int = 0,
+        max_slice_rows: int = 0,
+    ):
+        super().__init__()
+        self.columns = columns or []
+        self._projection = projection
+        self._projector = None
+        self.offset = start_offset
+        self._buffer = b""
+        self.sample = b""
+        self._header_done = start_offset > 0
+        self._hash = hashlib.blake2b(digest_size=CONTENT_HASH_SIZE) if not start_offset else None
+        if output_format not in OUTPUT_FORMATS:
+            raise ValueError(f"Unsupported output format: {output_format}")
+        self._output_format = output_format
+        self._compression = compression
+        self._column_types = column_types
+        self.max_slice_bytes = max_slice_bytes
+        self.max_slice_rows = max_slice_rows
+        self.slice_filenames = []
+        self._slice_bytes = 0
+        self._slice_rows = 0
+        self._slice_file = self._open_slice(slice_filename)
+        self._raw_file = open_output(raw_filename, raw_compression) if raw_filename else None
+        if self.columns:
+            self._set_columns(self.columns)
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        if exc_type is None:
+            self.finish()
+        return super().__exit__(exc_type, exc_val, exc_tb)
+
+    @property
+    def output_columns(self) -> list:
+        """Columns of the slice (columns of the report reduced by the projection)"""
+        return self._projection.output_columns(self.columns) if self._projection else self.columns
+
+    @property
+    def content_hash(self) -> str:
+        """Hex digest of the report content received so far, empty when the download started at an offset"""
+        return self._hash.hexdigest() if self._hash else ""
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data: bytes) -> int:
+        if self._hash:
+            self._hash.update(data)
+        rows_end = data.rfind(b"\n") + 1
+        if not rows_end:
+            self._buffer += data
+            return len(data)
+
+        rows = memoryview(data)[:rows_end]
+        if not self._header_done:
+            rows = self._buffer + rows
+            header_end = rows.find(b"\n") + 1
+            self._set_header(rows[:header_end])
+            rows = memoryview(rows)[header_end:]
+        elif self._buffer:
+            # complete the held back row first, every write consists of whole rows
+            first_row_end = data.find(b"\n") + 1
+            self._write_rows(self._buffer + data[:first_row_end])
+            rows = rows[first_row_end:]
+        if rows:
+            self._write_rows(rows)
+        self._buffer = data[rows_end:]
+        return len(data)
+
+    def finish(self):
+        """Write the held back data - the download is complete, the last row needs no line terminator"""
+        if not self._buffer:
+            return
+        if not self._header_done:
+            # report consisting of a header line without line terminator
+            self._set_header(self._buffer)
+        else:
+            self._write_rows(self._buffer)
+        self._buffer = b""
+
+    def close(self):
+        if self.closed:
+            return
+        try:
+            self._slice_file.close()
+            if self._raw_file:
+                self._raw_file.close()
+        finally:
+            super().close()
+
+    def _set_header(self, header_line: bytes):
+        self._set_columns(next(csv.reader([header_line.decode("utf-8").rstrip("\r\n")]), []))
+        self._header_done = True
+        if self._raw_file:
+            self._raw_file.write(header_line)
+        self.offset += len(header_line)
+
+    def _set_columns(self, columns: list):
+        self.columns = columns
+        if self._projection:
+            self._projector = self._projection.projector(columns)
+        if isinstance(self._slice_file, ParquetOutput):
+            self._slice_file.set_columns(self.output_columns)
+
+    def _open_slice(self, filename: str):
+        self.slice_filenames.append(filename)
+        self._slice_bytes = 0
+        self._slice_rows = 0
+        if self._output_format == "parquet":
+            slice_file = ParquetOutput(filename, self._column_types)
+            if self.columns:
+                slice_file.set_columns(self.output_columns)
+            return slice_file
+        return open_output(filename, self._compression)
+
+    def _next_slice(self):
+        """Close the current slice and continue with a new part"""
+        self._slice_file.close()
+        first_filename = self.slice_filenames[0]
+        directory, name = os.path.split(first_filename)
+        stem, dot, extension = name.partition(".")
+        self._slice_file = self._open_slice(
+            os.path.join(directory, f"{stem}_part{len(self.slice_filenames) + 1}{dot}{extension}")
+        )
+
+    def _write_rows(self, rows):
+        slice_rows = self._projector.apply(rows) if self._projector else rows
+        if len(self.sample) < SAMPLE_BYTES:
+            self._add_sample(slice_rows)
+        if self.max_slice_bytes or self.max_slice_rows:
+            self._write_slices(bytes(slice_rows))
+        else:
+            self._slice_file.write(slice_rows)
+        if self._raw_file:
+            self._raw_file.write(rows)
+        self.offset += len(rows)
+
+    def _add_sample(self, rows):
+        sample = self.sample + bytes(rows[: SAMPLE_BYTES - len(self.sample)])
+        if not sample.endswith(b"\n") and len(sample) < len(self.sample) + len(rows):
+            # keep whole rows only, the rest of the cut row is not part of the sample
+            sample = sample[: max(sample.rfind(b"\n") + 1, len(self.sample))]
+        self.sample = sample
+
+    def _write_slices(self, rows: bytes):
+        """Write complete rows, starting a new slice whenever the current one is full"""
+        start = 0
+        while start < len(rows):
+            end = self._slice_end(rows, start)
+            if end == start:
+                self._next_slice()
+                continue
+            self._slice_file.write(memoryview(rows)[start:end])
+            self._slice_bytes += end - start
+            self._slice_rows += rows.count(b"\n", start, end) + (rows[end - 1 : end] != b"\n")
+            start = end
+
+    def _slice_end(self, rows: bytes, start: int) -> int:
+        """End of the rows (from start) fitting into the current slice, start if the slice is full"""
+        end = len(rows)
+        if self.max_slice_bytes and self._slice_bytes + end - start > self.max_slice_bytes:
+            end = rows.rfind(b"\n", start, start + self.max_slice_bytes - self._slice_bytes) + 1 or start
+            if end == start and not self._slice_bytes:
+                # a row larger than a slice
+                end = rows.find(b"\n", start) + 1 or len(rows)
+        if self.max_slice_rows:
+            rows_left = self.max_slice_rows - self._slice_rows
+            if rows.count(b"\n", start, end) >= rows_left:
+                position = start
+                for _ in range(rows_left):
+                    position = rows.find(b"\n", position) + 1
+                end = position
+        return end
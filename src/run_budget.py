@@ -0,0 +1,51 @@
+"""
+Budget of a single run of the component.
+
+The platform terminates runs exceeding their time limit and keeps neither their output nor their state.
+The budget lets the component stop starting new downloads in time, so it finishes regularly with the data
+downloaded so far and the next run continues with the rest.
+"""
+
+import logging
+import threading
+import time
+
+
+class RunBudget:
+    """Thread-safe run time and downloaded bytes budget
+
+    A budget is exhausted when the run time or the downloaded bytes reach the limit. Downloads that already
+    started are not interrupted, so the limits should leave a reserve for them.
+
+    Args:
+        max_seconds: Run time limit in seconds, 0 for no limit
+        max_bytes: Limit of downloaded bytes, 0 for no limit
+    """
+
+    def __init__(self, max_seconds: float = 0, max_bytes: int = 0):
+        self.max_seconds = max_seconds
+        self.max_bytes = max_bytes
+        self.downloaded_bytes = 0
+        self._started = time.monotonic()
+        self._lock = threading.Lock()
+        self._exhausted = False
+
+    def add_bytes(self, count: int):
+        """Account bytes of a finished (or failed) download"""
+        with self._lock:
+            self.downloaded_bytes += count
+
+    def exhausted(self) -> bool:
+        """True if no more downloads shall be started (a warning is logged once when it happens)"""
+        with self._lock:
+            if not self._exhausted:
+                elapsed = time.monotonic() - self._started
+                if self.max_seconds and elapsed >= self.max_seconds:
+                    self._exhausted = True
+                    logging.warning(f"Run time budget of {self.max_seconds:.0f} s is exhausted")
+                elif self.max_bytes and self.downloaded_bytes >= self.max_bytes:
+                    self._exhausted = True
+                    logging.warning(f"Download budget of {self.max_bytes} bytes is exhausted")
+                if self._exhausted:
+                    logging.warning("No more reports are downloaded in this run, the rest is left for the next run")
+            return self._exhausted
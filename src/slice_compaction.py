@@ -0,0 +1,111 @@
+"""
+Compaction of small table slices.
+
+Every report period is downloaded into a slice of its own. Small channels produce hundreds of tiny slices
+and the overhead of uploading and loading each file dominates. Before the manifest is written, runs
+of consecutive small slices (ordered by name, i.e. by period) are merged into slices near a target size.
+Slices are merged as they are, rows are neither changed nor reordered, so an incremental load with
+the primary key gives the same result.
+"""
+
+import gzip
+import logging
+import os
+
+from report_writer import open_output
+
+# Size of blocks copied from merged slices
+COPY_BUFFER_SIZE = 1024 * 1024
+# Suffix of the slice being written, it replaces the first slice of the merged run
+COMPACTING_SUFFIX = ".compacting"
+
+
+def compact_slices(
+    folder: str, compression: str = "none", target_bytes: int = 0, max_bytes: int = 0, max_rows: int = 0
+) -> int:
+    """Merge runs of consecutive slices of a sliced table into slices of at most target_bytes
+
+    Args:
+        folder: Folder of the sliced table
+        compression: Compression of the slices (one of report_writer.TABLE_COMPRESSIONS)
+        target_bytes: Size of a merged slice (on disk), slices of this size or larger are kept as they are
+        max_bytes: Size of the data of a merged slice (uncompressed), 0 for no limit
+        max_rows: Number of rows of a merged slice, 0 for no limit
+
+    Returns:
+        Number of slices removed by merging
+    """
+    runs = []
+    run = []
+    run_size = run_bytes = run_rows = 0
+    for name in sorted(os.listdir(folder)):
+        filename = os.path.join(folder, name)
+        size = os.path.getsize(filename)
+        data_bytes = rows = 0
+        if size < target_bytes and (max_bytes or max_rows):
+            data_bytes, rows = _scan(filename, compression)
+        large = size >= target_bytes or (max_bytes and data_bytes >= max_bytes) or (max_rows and rows >= max_rows)
+        if run and (
+            large
+            or run_size + size > target_bytes
+            or (max_bytes and run_bytes + data_bytes > max_bytes)
+            or (max_rows and run_rows + rows > max_rows)
+        ):
+            runs.append(run)
+            run = []
+            run_size = run_bytes = run_rows = 0
+        if large:
+            continue
+        run.append(filename)
+        run_size += size
+        run_bytes += data_bytes
+        run_rows += rows
+    runs.append(run)
+
+    removed = 0
+    for run in runs:
+        if len(run) > 1:
+            _merge(run, compression)
+            removed += len(run) - 1
+    if removed:
+        logging.info(f"Compacted {removed} small slices of {os.path.basename(folder)}")
+    return removed
+
+
+def _open_slice(filename: str, compression: str):
+    return gzip.open(filename, mode="rb") if compression == "gzip" else open(filename, mode="rb")
+
+
+def _scan(filename: str, compression: str) -> tuple[int, int]:
+    """Size of the data (uncompressed, including a line terminator added by merging) and number of rows"""
+    data_bytes = rows = 0
+    last = b"\n"
+    with _open_slice(filename, compression) as slice_file:
+        while chunk := slice_file.read(COPY_BUFFER_SIZE):
+            data_bytes += len(chunk)
+            rows += chunk.count(b"\n")
+            last = chunk[-1:]
+    missing_terminator = last != b"\n"
+    return data_bytes + missing_terminator, rows + missing_terminator
+
+
+def _merge(filenames: list, compression: str):
+    """Merge slices into the first one, a slice without a trailing line terminator gets one"""
+    merged_filename = filenames[0] + COMPACTING_SUFFIX
+    try:
+        with open_output(merged_filename, compression) as merged_file:
+            for filename in filenames:
+                last = b"\n"
+                with _open_slice(filename, compression) as slice_file:
+                    while chunk := slice_file.read(COPY_BUFFER_SIZE):
+                        merged_file.write(chunk)
+                        last = chunk[-1:]
+                if last != b"\n":
+                    merged_file.write(b"\n")
+        os.replace(merged_filename, filenames[0])
+    except BaseException:
+        if os.path.exists(merged_filename):
+            os.remove(merged_filename)
+        raise
+    for filename in filenames[1:]:
+        os.remove(filename)
@@ -0,0 +1,226 @@
+import io
+import json
+import threading
+import unittest
+from unittest import mock
+
+import httpx
+from googleapiclient.http import HttpMockSequence, HttpRequest
+from keboola.component.exceptions import UserException
+
+from google_yt.async_client import BlockingAsyncClient
+from google_yt.client import ADAPTIVE_INITIAL_CHUNK_SIZE, Client, ReportMediaDownload
+
+DOWNLOAD_URL = "https://youtubereporting.googleapis.com/v1/media/report?alt=media"
+
+
+def media_request(responses: list) -> HttpRequest:
+    http = HttpMockSequence(responses)
+    return HttpRequest(http, lambda resp, content: content, DOWNLOAD_URL)
+
+
+class TestReportMediaDownload(unittest.TestCase):
+    def test_download_starts_at_offset(self):
+        request = media_request([({"status": "206", "content-range": "bytes 5-9/10"}, b"56789")])
+        with mock.patch.object(request.http, "request", wraps=request.http.request) as http_request:
+            out = io.BytesIO()
+            downloader = ReportMediaDownload(out, request, start_offset=5)
+            _, done = downloader.next_chunk()
+
+        self.assertTrue(done)
+        self.assertEqual(out.getvalue(), b"56789")
+        self.assertEqual(downloader.progress, 10)
+        self.assertTrue(http_request.call_args.kwargs["headers"]["range"].startswith("bytes=5-"))
+        self.assertEqual(http_request.call_args.kwargs["headers"]["accept-encoding"], "identity")
+
+    def test_adaptive_chunk_size(self):
+        request = media_request(
+            [
+                ({"status": "206", "content-range": "bytes 0-4/100"}, b"01234"),
+                ({"status": "500"}, b""),
+            ]
+        )
+        downloader = ReportMediaDownload(io.BytesIO(), request, chunk_size=64 * 1024 * 1024, adaptive_chunk_size=True)
+        self.assertEqual(downloader.chunk_size, ADAPTIVE_INITIAL_CHUNK_SIZE)
+
+        downloader.next_chunk()
+        self.assertEqual(downloader.chunk_size, 2 * ADAPTIVE_INITIAL_CHUNK_SIZE)
+
+        with self.assertRaises(Exception):
+            downloader.next_chunk()
+        self.assertEqual(downloader.chunk_size, ADAPTIVE_INITIAL_CHUNK_SIZE)
+        self.assertEqual(downloader.progress, 5)
+
+
+class TestClient(unittest.TestCase):
+    def test_transport_per_thread(self):
+        client = Client(access_token="token")
+        transports = []
+        worker = threading.Thread(target=lambda: transports.append(client.http))
+        worker.start()
+        worker.join()
+
+        self.assertIs(client.http, client.http)
+        self.assertIsNot(client.http, transports[0])
+        self.assertIs(client.http.credentials, transports[0].credentials)
+
+    def test_list_jobs_paginates(self):
+        http = HttpMockSequence(
+            [
+                ({"status": "200"}, json.dumps({"jobs": [{"id": "1"}], "nextPageToken": "next"})),
+                ({"status": "200"}, json.dumps({"jobs": [{"id": "2"}]})),
+            ]
+        )
+        with mock.patch.object(Client, "http", http):
+            jobs = Client(access_token="token").list_jobs()
+
+        self.assertEqual([job["id"] for job in jobs], ["1", "2"])
+        self.assertIn("pageToken=next", http.request_sequence[1][0])
+
+    def test_rate_limited_request_honors_retry_after(self):
+        http = HttpMockSequence(
+            [
+                ({"status": "429", "retry-after": "7"}, json.dumps({"error": {"code": 429, "message": "Quota"}})),
+                ({"status": "200"}, json.dumps({"jobs": [{"id": "1"}]})),
+            ]
+        )
+        client = Client(access_token="token")
+        with mock.patch.object(Client, "http", http), mock.patch("time.sleep") as sleep:
+            jobs = client.list_jobs()
+
+        self.assertEqual(jobs, [{"id": "1"}])
+        # the request waits for the rate limiter only, which holds it for the requested time
+        sleep.assert_called_once()
+        self.assertAlmostEqual(sleep.call_args.args[0], 7, delta=1)
+        self.assertLess(client.rate_limiter.rate, client.rate_limiter.max_rate)
+
+    def test_client_error_is_not_retried(self):
+        http = HttpMockSequence([({"status": "403"}, json.dumps({"error": {"code": 403, "message": "Forbidden"}}))])
+        with mock.patch.object(Client, "http", http), mock.patch("time.sleep") as sleep:
+            with self.assertRaisesRegex(UserException, "Http error 403"):
+                Client(access_token="token").list_jobs()
+
+        sleep.assert_not_called()
+
+
+def batch_response(responses: list) -> tuple[dict, bytes]:
+    """Multipart response of a batch request, responses are (status, json body) in order of the calls"""
+    parts = []
+    for request_id, (status, body) in enumerate(responses, start=1):
+        parts.append(
+            f"--batch_boundary\r\nContent-Type: application/http\r\nContent-ID: <base + {request_id}>\r\n\r\n"
+            f"HTTP/1.1 {status} Status\r\nContent-Type: application/json\r\n\r\n{json.dumps(body)}\r\n"
+        )
+    content = "".join(parts) + "--batch_boundary--"
+    return {"status": "200", "content-type": "multipart/mixed; boundary=batch_boundary"}, content.encode()
+
+
+class TestClientBatch(unittest.TestCase):
+    def setUp(self):
+        self.client = Client(access_token="token")
+
+    def test_list_reports_for_jobs(self):
+        http = HttpMockSequence(
+            [
+                batch_response(
+                    [
+                        (200, {"reports": [{"id": "1"}], "nextPageToken": "next"}),
+                        (403, {"error": {"code": 403, "message": "Forbidden"}}),
+                        (200, {}),
+                    ]
+                ),
+                batch_response([(200, {"reports": [{"id": "2"}]})]),
+            ]
+        )
+        jobs = {"a": ("job_a", "2023-08-01T00:00:00Z"), "b": ("job_b", ""), "c": ("job_c", "")}
+        with mock.patch.object(Client, "http", http):
+            reports, errors = self.client.list_reports_for_jobs(
+                jobs, start_time_at_or_after="2023-07-01T00:00:00Z", context_description="Listing reports"
+            )
+
+        self.assertEqual(reports, {"a": [{"id": "1"}, {"id": "2"}], "c": []})
+        self.assertEqual(str(errors["b"]), "Listing reports for b - Http error 403: Forbidden")
+        self.assertIn("createdAfter=2023-08-01T00%3A00%3A00Z", http.request_sequence[0][2])
+        self.assertIn("pageToken=next", http.request_sequence[1][2])
+        self.assertIn("startTimeAtOrAfter=2023-07-01T00%3A00%3A00Z", http.request_sequence[1][2])
+
+    def test_delete_jobs_ignores_missing_job(self):
+        http = HttpMockSequence(
+            [
+                batch_response(
+                    [
+                        (404, {"error": {"code": 404, "message": "Not found"}}),
+                        (403, {"error": {"code": 403, "message": "Forbidden"}}),
+                    ]
+                )
+            ]
+        )
+        with mock.patch.object(Client, "http", http):
+            with self.assertRaisesRegex(UserException, "^Deleting job for b - Http error 403: Forbidden$"):
+                self.client.delete_jobs({"a": "job_a", "b": "job_b"}, context_description="Deleting job")
+
+    def test_transient_error_is_retried(self):
+        http = HttpMockSequence(
+            [
+                batch_response([(200, {"id": "job_a"}), (503, {"error": {"code": 503, "message": "Unavailable"}})]),
+                batch_response([(200, {"id": "job_b"})]),
+            ]
+        )
+        with mock.patch.object(Client, "http", http), mock.patch("time.sleep") as sleep:
+            jobs = self.client.create_jobs({"a": "keboola_a", "b": "keboola_b"})
+
+        self.assertEqual(jobs, {"a": {"id": "job_a"}, "b": {"id": "job_b"}})
+        sleep.assert_called_once()
+
+
+class TestBlockingAsyncClient(unittest.TestCase):
+    def setUp(self):
+        self.requests = []
+        self.client = BlockingAsyncClient(access_token="token")
+        self.client._client._http = httpx.AsyncClient(transport=httpx.MockTransport(self.handle))
+
+    def tearDown(self):
+        self.client.close()
+
+    def handle(self, request: httpx.Request) -> httpx.Response:
+        self.requests.append(request)
+        if request.url.path.endswith("/reports"):
+            if "pageToken" in request.url.params:
+                return httpx.Response(200, json={"reports": [{"id": "2"}]})
+            return httpx.Response(200, json={"reports": [{"id": "1"}], "nextPageToken": "next"})
+        if request.url.path.endswith("/jobs") and request.method == "POST":
+            return httpx.Response(403, json={"error": {"code": 403, "message": "Forbidden report type"}})
+        return httpx.Response(206, content=b"56789")
+
+    def test_list_reports_paginates(self):
+        reports = self.client.list_reports(job_id="job", created_after="2023-08-01T00:00:00Z")
+
+        self.assertEqual([report["id"] for report in reports], ["1", "2"])
+        self.assertEqual(self.requests[0].headers["Authorization"], "Bearer token")
+        self.assertEqual(self.requests[0].url.params["createdAfter"], "2023-08-01T00:00:00Z")
+
+    def test_download_resumes_at_offset(self):
+        out = io.BytesIO()
+        self.client.download_report(download_url=DOWNLOAD_URL, out_stream=out, start_offset=5)
+
+        self.assertEqual(out.getvalue(), b"56789")
+        self.assertEqual(self.requests[0].headers["Range"], "bytes=5-")
+        self.assertEqual(self.requests[0].headers["Accept-Encoding"], "identity")
+
+    def test_compressed_transfer_of_first_request_only(self):
+        self.client.download_report(download_url=DOWNLOAD_URL, out_stream=io.BytesIO(), compressed_transfer=True)
+        self.client.download_report(
+            download_url=DOWNLOAD_URL, out_stream=io.BytesIO(), start_offset=5, compressed_transfer=True
+        )
+
+        self.assertIn("gzip", self.requests[0].headers["Accept-Encoding"])
+        self.assertEqual(self.requests[1].headers["Accept-Encoding"], "identity")
+
+    def test_http_error_is_user_exception(self):
+        with self.assertRaisesRegex(UserException, "Creating job - Http error 403: Forbidden report type"):
+            self.client.create_job("job", report_type_id="channel_basic_a3", context_description="Creating job")
+        self.assertEqual(json.loads(self.requests[0].content)["reportTypeId"], "channel_basic_a3")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,36 @@
+import unittest
+
+from column_metadata import candidate_types, detect_types, merge_types
+
+
+class TestColumnMetadata(unittest.TestCase):
+    def test_candidate_types_of_registry_columns(self):
+        types = candidate_types("channel_basic_a3")
+        self.assertEqual(types["date"], "STRING")
+        self.assertEqual(types["channel_id"], "STRING")
+        self.assertEqual(types["views"], "INTEGER")
+        self.assertEqual(types["watch_time_minutes"], "NUMERIC")
+        self.assertEqual(candidate_types("unknown_report_type"), {})
+
+    def test_sample_confirms_candidate_types(self):
+        candidates = {"date": "STRING", "channel_id": "STRING", "views": "INTEGER", "rate": "NUMERIC", "x": "INTEGER"}
+        columns = ["date", "channel_id", "views", "rate", "x", "unknown"]
+        sample = b"20230801,a,1,0.5,,1\n20230802,b,2.5,1e-3,,2\n"
+        self.assertEqual(
+            detect_types(columns, sample, candidates),
+            {
+                "date": "STRING",
+                "channel_id": "STRING",
+                "views": "NUMERIC",
+                "rate": "NUMERIC",
+                "x": "INTEGER",
+                "unknown": "STRING",
+            },
+        )
+
+    def test_merge_types_generalizes(self):
+        merged = merge_types(
+            {"a": "INTEGER", "b": "NUMERIC", "c": "INTEGER"}, {"a": "NUMERIC", "b": "INTEGER", "c": "STRING"}
+        )
+        self.assertEqual(merged, {"a": "NUMERIC", "b": "NUMERIC", "c": "STRING"})
+        self.assertEqual(merge_types({}, {"a": "INTEGER"}), {"a": "INTEGER"})
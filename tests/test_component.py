@@ -4,13 +4,21 @@ Created on 12. 11. 2018
 @author: esner
 """
 
+import hashlib
+import json
 import os
+import tempfile
+import threading
+import time
 import unittest
 from unittest import mock
 
 from freezegun import freeze_time
+from keboola.component.exceptions import UserException
 
 from component import Component
+from configuration import Configuration, ReportTypeSettings, RowFilter
+from run_budget import RunBudget
 
 
 class TestComponent(unittest.TestCase):
@@ -24,6 +32,466 @@ class TestComponent(unittest.TestCase):
             comp.run()
 
 
+class ComponentTestCase(unittest.TestCase):
+    """Component with a temporary data folder and configuration"""
+
+    def setUp(self):
+        self.data_dir = tempfile.TemporaryDirectory()
+        os.makedirs(os.path.join(self.data_dir.name, "out", "tables"))
+        os.makedirs(os.path.join(self.data_dir.name, "out", "files"))
+        config = {"parameters": {"report_settings": {"report_types": ["channel_basic_a3", "channel_cards_a1"]}}}
+        with open(os.path.join(self.data_dir.name, "config.json"), "w") as config_file:
+            json.dump(config, config_file)
+        with mock.patch.dict(os.environ, {"KBC_DATADIR": self.data_dir.name}):
+            self.comp = Component()
+        self.comp.conf = Configuration.fromDict(parameters=self.comp.configuration.parameters)
+
+    def tearDown(self):
+        self.data_dir.cleanup()
+
+
+class TestConfiguration(ComponentTestCase):
+    def run_component(self, parameters: dict):
+        parameters = {"report_settings": {"report_types": ["channel_basic_a3"]}, **parameters}
+        with open(os.path.join(self.data_dir.name, "config.json"), "w") as config_file:
+            json.dump({"parameters": parameters}, config_file)
+        with mock.patch.dict(os.environ, {"KBC_DATADIR": self.data_dir.name}):
+            Component().run()
+
+    def test_compressed_transfer_of_sync_client_warns(self):
+        # invalid output format stops the run right after the checks of the download settings
+        output_settings = {"format": "xml"}
+        with self.assertLogs(level="WARNING") as logs, self.assertRaises(UserException):
+            self.run_component({"download_settings": {"compressed_transfer": True}, "output_settings": output_settings})
+        self.assertIn("Compressed transfer is supported by the async API client only", logs.output[0])
+
+        with mock.patch("logging.warning") as warning, self.assertRaises(UserException):
+            self.run_component(
+                {
+                    "download_settings": {"compressed_transfer": True, "api_client": "async"},
+                    "output_settings": output_settings,
+                }
+            )
+        warning.assert_not_called()
+
+
+class TestProcessJobs(ComponentTestCase):
+    def test_failed_job_does_not_stop_others(self):
+        jobs = {
+            "channel_basic_a3": {"id": "1", "reportTypeId": "channel_basic_a3"},
+            "channel_cards_a1": {"id": "2", "reportTypeId": "channel_cards_a1"},
+        }
+
+        def prepare_job(job, reports, table_name):
+            if job["id"] == "1":
+                raise UserException("boom")
+            job["lastReportCreateTime"] = "2023-08-01T00:00:00Z"
+
+        self.comp.client_yt = mock.Mock()
+        self.comp.client_yt.list_reports_for_jobs.return_value = ({key: [] for key in jobs}, {})
+        with mock.patch.object(self.comp, "_prepare_job", side_effect=prepare_job):
+            errors = self.comp.process_jobs(jobs)
+
+        self.assertEqual(list(errors), ["channel_basic_a3"])
+        self.assertNotIn("lastReportCreateTime", jobs["channel_basic_a3"])
+        self.assertEqual(jobs["channel_cards_a1"]["lastReportCreateTime"], "2023-08-01T00:00:00Z")
+
+    def test_write_state_file_replaces_state(self):
+        self.comp.write_state_file({"jobs": {}})
+        state_path = os.path.join(self.data_dir.name, "out", "state.json")
+        with open(state_path) as state_file:
+            self.assertEqual(json.load(state_file), {"jobs": {}})
+        self.assertFalse(os.path.exists(f"{state_path}.tmp"))
+
+    def test_failed_listing_skips_job(self):
+        jobs = {
+            "channel_basic_a3": {"id": "1", "reportTypeId": "channel_basic_a3"},
+            "channel_cards_a1": {"id": "2", "reportTypeId": "channel_cards_a1", "lastReportCreateTime": "t"},
+        }
+        self.comp.client_yt = mock.Mock()
+        self.comp.client_yt.list_reports_for_jobs.return_value = (
+            {"channel_cards_a1": [{"id": "r"}]},
+            {"channel_basic_a3": UserException("Listing reports for channel_basic_a3 - Http error 403")},
+        )
+        with mock.patch.object(self.comp, "_prepare_job", return_value=None) as prepare_job:
+            errors = self.comp.process_jobs(jobs)
+
+        self.assertEqual(list(errors), ["channel_basic_a3"])
+        prepare_job.assert_called_once_with(jobs["channel_cards_a1"], [{"id": "r"}], "channel_cards_a1")
+        listed_jobs = self.comp.client_yt.list_reports_for_jobs.call_args.args[0]
+        self.assertEqual(listed_jobs, {"channel_basic_a3": ("1", None), "channel_cards_a1": ("2", "t")})
+
+    def test_backfill_window_is_pushed_down(self):
+        self.comp.conf.report_settings.backfill_start_date = "2023-07-01"
+        self.comp.conf.report_settings.backfill_end_date = "2023-07-31"
+        self.comp.client_yt = mock.Mock()
+        self.comp.client_yt.list_reports_for_jobs.return_value = ({}, {})
+        self.comp.process_jobs({"channel_basic_a3": {"id": "1", "reportTypeId": "channel_basic_a3"}})
+
+        kwargs = self.comp.client_yt.list_reports_for_jobs.call_args.kwargs
+        self.assertEqual(kwargs["start_time_at_or_after"], "2023-07-01T00:00:00Z")
+        self.assertEqual(kwargs["start_time_before"], "2023-08-01T00:00:00Z")
+
+    def test_reports_listed_per_owner(self):
+        jobs = {
+            "a_channel_basic_a3": {"id": "1", "reportTypeId": "channel_basic_a3"},
+            "b_channel_basic_a3": {"id": "2", "reportTypeId": "channel_basic_a3"},
+        }
+        self.comp.client_yt = mock.Mock()
+        self.comp.client_yt.list_reports_for_jobs.return_value = ({}, {})
+        self.comp.process_jobs(jobs, owners={"a_channel_basic_a3": "a", "b_channel_basic_a3": "b"})
+
+        calls = self.comp.client_yt.list_reports_for_jobs.call_args_list
+        self.assertEqual([call.kwargs["on_behalf_of_owner"] for call in calls], ["a", "b"])
+        self.assertEqual(calls[1].args[0], {"b_channel_basic_a3": ("2", None)})
+
+
+class TestLoadJobCatalog(ComponentTestCase):
+    STATE = {
+        "onBehalfOfContentOwner": "",
+        "jobs": {"channel_basic_a3": {"id": "1"}, "channel_cards_a1": {"id": "2"}},
+    }
+    JOBS = {
+        "channel_basic_a3": {"id": "1", "reportTypeId": "channel_basic_a3"},
+        "channel_cards_a1": {"id": "2", "reportTypeId": "channel_cards_a1"},
+    }
+
+    def setUp(self):
+        super().setUp()
+        self.comp.client_yt = mock.Mock()
+
+    def test_valid_state_jobs_skip_listing(self):
+        self.comp.client_yt.get_jobs.return_value = self.JOBS
+        catalog = self.comp._load_job_catalog("", self.STATE, list(self.JOBS))
+
+        self.comp.client_yt.list_jobs.assert_not_called()
+        self.assertEqual(catalog.get("channel_cards_a1")["id"], "2")
+
+    def test_missing_job_falls_back_to_listing(self):
+        self.comp.client_yt.get_jobs.return_value = {"channel_basic_a3": self.JOBS["channel_basic_a3"]}
+        self.comp.client_yt.list_jobs.return_value = list(self.JOBS.values())
+        catalog = self.comp._load_job_catalog("", self.STATE, list(self.JOBS))
+
+        self.comp.client_yt.list_jobs.assert_called_once()
+        self.assertIn("channel_cards_a1", catalog)
+
+    def test_new_report_type_lists_jobs(self):
+        self.comp.client_yt.list_jobs.return_value = []
+        self.comp._load_job_catalog("", self.STATE, list(self.JOBS) + ["channel_province_a3"])
+
+        self.comp.client_yt.get_jobs.assert_not_called()
+
+
+class TestContentOwners(ComponentTestCase):
+    def test_single_owner_state_is_owner_state(self):
+        state = {"onBehalfOfContentOwner": "a", "jobs": {"channel_basic_a3": {"id": "1"}}}
+        self.assertEqual(self.comp._previous_owner_states(state), {"a": state})
+        self.assertEqual(self.comp._previous_owner_states({"owners": {"a": state}}), {"a": state})
+        self.assertEqual(self.comp._previous_owner_states({}), {"": {"onBehalfOfContentOwner": "", "jobs": {}}})
+
+    def test_removed_owner_jobs_are_deleted(self):
+        state = {
+            "onBehalfOfContentOwner": "a",
+            "jobs": {"channel_basic_a3": {"id": "1", "created": True}, "channel_cards_a1": {"id": "2"}},
+        }
+        self.comp.client_yt = mock.Mock()
+        self.comp.client_yt.get_jobs.return_value = {
+            "channel_basic_a3": {"id": "1", "reportTypeId": "channel_basic_a3"},
+            "channel_cards_a1": {"id": "2", "reportTypeId": "channel_cards_a1"},
+        }
+        owner_state = self.comp._prepare_owner_jobs("a", state, [])
+
+        self.assertEqual(owner_state, {"onBehalfOfContentOwner": "a", "jobs": {}})
+        self.comp.client_yt.delete_jobs.assert_called_once_with(
+            {"channel_basic_a3": "1"}, on_behalf_of_owner="a", context_description="Deleting job"
+        )
+        self.comp.client_yt.create_jobs.assert_not_called()
+
+
+class TestJobDownloads(ComponentTestCase):
+    REPORT_DATA = {"1": b"date,channel_id,views\n20230729,abc,1\n", "2": b"date,channel_id,views\n20230730,abc,2\n"}
+
+    def setUp(self):
+        super().setUp()
+        self.comp.client_yt = mock.Mock()
+        self.comp.client_yt.download_report.side_effect = self.download_report
+
+    def download_report(self, download_url, out_stream, **kwargs):
+        out_stream.write(self.REPORT_DATA[download_url])
+
+    def process_job(self, job: dict, reports: list) -> dict:
+        jobs = {job["reportTypeId"]: job}
+        self.comp.client_yt.list_reports_for_jobs.return_value = ({job["reportTypeId"]: reports}, {})
+        self.comp.process_jobs(jobs)
+        return jobs[job["reportTypeId"]]
+
+    def test_unchanged_and_loaded_reports_are_skipped(self):
+        data = self.REPORT_DATA["1"]
+        content_hash = hashlib.blake2b(data, digest_size=16).hexdigest()
+        job = {
+            "id": "1",
+            "reportTypeId": "channel_basic_a3",
+            "reportLedger": {
+                "2023-07-29T07:00:00Z": ["old", "2023-07-31T04:00:00Z", content_hash, len(data)],
+                "2023-07-30T07:00:00Z": ["2", "2023-08-01T04:00:00Z", "", 0],
+            },
+        }
+        reports = [
+            {"id": "1", "startTime": "2023-07-29T07:00:00Z", "createTime": "2023-08-02T04:00:00Z", "downloadUrl": "1"},
+            {"id": "2", "startTime": "2023-07-30T07:00:00Z", "createTime": "2023-08-01T04:00:00Z", "downloadUrl": "2"},
+        ]
+        job = self.process_job(job, reports)
+
+        self.comp.client_yt.download_report.assert_called_once()
+        self.assertFalse(os.path.exists(os.path.join(self.comp.tables_out_path, "channel_basic_a3.csv")))
+        self.assertEqual(job["reportLedger"]["2023-07-29T07:00:00Z"][:2], ["1", "2023-08-02T04:00:00Z"])
+        self.assertEqual(job["lastReportCreateTime"], "2023-08-02T04:00:00Z")
+
+    def test_unexpected_download_failure_fails_job_only(self):
+        jobs = {
+            "channel_basic_a3": {"id": "1", "reportTypeId": "channel_basic_a3"},
+            "channel_cards_a1": {"id": "2", "reportTypeId": "channel_cards_a1"},
+        }
+        reports = {
+            "channel_basic_a3": [
+                {
+                    "id": "1",
+                    "startTime": "2023-07-29T07:00:00Z",
+                    "createTime": "2023-08-01T04:00:00Z",
+                    "downloadUrl": "1",
+                }
+            ],
+            "channel_cards_a1": [
+                {
+                    "id": "2",
+                    "startTime": "2023-07-30T07:00:00Z",
+                    "createTime": "2023-08-01T04:00:00Z",
+                    "downloadUrl": "2",
+                }
+            ],
+        }
+        self.comp.client_yt.list_reports_for_jobs.return_value = (reports, {})
+        download_report_slice = self.comp._download_report_slice
+
+        def failing_download(report, *args):
+            if report["id"] == "1":
+                raise OSError("No space left on device")
+            return download_report_slice(report, *args)
+
+        with mock.patch.object(self.comp, "_download_report_slice", side_effect=failing_download), self.assertLogs():
+            errors = self.comp.process_jobs(jobs)
+
+        self.assertEqual(list(errors), ["channel_basic_a3"])
+        self.assertNotIn("lastReportCreateTime", jobs["channel_basic_a3"])
+        self.assertEqual(jobs["channel_cards_a1"]["lastReportCreateTime"], "2023-08-01T04:00:00Z")
+        self.assertFalse(os.path.exists(os.path.join(self.comp.tables_out_path, "channel_basic_a3.csv")))
+
+    def test_exhausted_budget_leaves_reports_for_next_run(self):
+        job = {"id": "1", "reportTypeId": "channel_basic_a3", "lastReportCreateTime": "2023-07-31T04:00:00Z"}
+        reports = [
+            {"id": "1", "startTime": "2023-07-29T07:00:00Z", "createTime": "2023-08-01T04:00:00Z", "downloadUrl": "1"},
+            {"id": "2", "startTime": "2023-07-30T07:00:00Z", "createTime": "2023-08-01T04:00:00Z", "downloadUrl": "2"},
+        ]
+        self.comp.budget = RunBudget(max_bytes=1)
+        self.comp.conf.download_settings.max_parallel_jobs = 1
+        self.comp.conf.download_settings.max_parallel_downloads = 1
+        with self.assertLogs():
+            job = self.process_job(job, reports)
+
+        self.comp.client_yt.download_report.assert_called_once()
+        self.assertTrue(os.path.exists(os.path.join(self.comp.tables_out_path, "channel_basic_a3.csv.manifest")))
+        self.assertEqual(list(job["reportLedger"]), ["2023-07-29T07:00:00Z"])
+        self.assertEqual(job["lastReportCreateTime"], "2023-07-31T04:00:00Z")
+
+    def test_exhausted_budget_with_adaptive_concurrency(self):
+        self.REPORT_DATA = {str(day): f"date,channel_id,views\n2023080{day},abc,1\n".encode() for day in range(1, 5)}
+        job = {"id": "1", "reportTypeId": "channel_basic_a3"}
+        reports = [
+            {"id": str(day), "startTime": f"2023-08-0{day}T07:00:00Z", "createTime": "2023-08-06T04:00:00Z"}
+            for day in range(1, 5)
+        ]
+        for report in reports:
+            report["downloadUrl"] = report["id"]
+        self.comp.budget = RunBudget(max_bytes=1)
+        self.comp.conf.download_settings.adaptive_concurrency = True
+        self.comp.conf.download_settings.max_parallel_jobs = 4
+        self.comp.conf.download_settings.max_parallel_downloads = 1
+
+        def slow_download_report(download_url, out_stream, **kwargs):
+            time.sleep(0.05)  # other workers would be waiting for the slot meanwhile
+            self.download_report(download_url, out_stream)
+
+        self.comp.client_yt.download_report.side_effect = slow_download_report
+        with self.assertLogs():
+            job = self.process_job(job, reports)
+
+        self.comp.client_yt.download_report.assert_called_once()
+        self.assertEqual(self.comp.client_yt.download_report.call_args.kwargs["download_url"], "1")
+        self.assertEqual(list(job["reportLedger"]), ["2023-08-01T07:00:00Z"])
+        self.assertEqual(
+            os.listdir(os.path.join(self.comp.tables_out_path, "channel_basic_a3.csv")), ["2023-08-01T07_00_00Z.csv"]
+        )
+
+    def test_priority_across_jobs(self):
+        jobs = {
+            "channel_basic_a3": {"id": "1", "reportTypeId": "channel_basic_a3"},
+            "channel_cards_a1": {"id": "2", "reportTypeId": "channel_cards_a1"},
+        }
+        reports = {
+            "channel_basic_a3": [
+                {
+                    "id": "1",
+                    "startTime": "2023-07-29T07:00:00Z",
+                    "createTime": "2023-07-31T04:00:00Z",
+                    "downloadUrl": "1",
+                }
+            ],
+            "channel_cards_a1": [
+                {
+                    "id": "2",
+                    "startTime": "2023-07-30T07:00:00Z",
+                    "createTime": "2023-08-01T04:00:00Z",
+                    "downloadUrl": "2",
+                }
+            ],
+        }
+        self.comp.conf.download_settings.priority = "newest_first"
+        self.comp.conf.download_settings.max_parallel_jobs = 1
+        self.comp.conf.download_settings.max_parallel_downloads = 1
+        self.comp.budget = RunBudget(max_bytes=1)
+        self.comp.client_yt.list_reports_for_jobs.return_value = (reports, {})
+        with self.assertLogs():
+            errors = self.comp.process_jobs(jobs)
+
+        self.assertEqual(errors, {})
+        self.comp.client_yt.download_report.assert_called_once()
+        self.assertEqual(self.comp.client_yt.download_report.call_args.kwargs["download_url"], "2")
+        self.assertNotIn("lastReportCreateTime", jobs["channel_basic_a3"])
+        self.assertEqual(jobs["channel_cards_a1"]["lastReportCreateTime"], "2023-08-01T04:00:00Z")
+
+    def test_limits_of_parallel_jobs_and_downloads(self):
+        table_names = ["channel_basic_a3", "channel_cards_a1"]
+        jobs = {table_name: {"id": table_name, "reportTypeId": table_name} for table_name in table_names}
+        reports = {
+            table_name: [
+                {
+                    "id": f"{table_name}_{day}",
+                    "startTime": f"2023-08-0{day}T07:00:00Z",
+                    "createTime": "2023-08-06T04:00:00Z",
+                    "downloadUrl": f"{table_name}_{day}",
+                }
+                for day in range(1, 4)
+            ]
+            for table_name in table_names
+        }
+        self.REPORT_DATA = {
+            report["downloadUrl"]: f"date,channel_id,views\n2023080{report['id'][-1]},abc,1\n".encode()
+            for job_reports in reports.values()
+            for report in job_reports
+        }
+        self.comp.conf.download_settings.max_parallel_jobs = 1
+        self.comp.conf.download_settings.max_parallel_downloads = 2
+        lock = threading.Lock()
+        in_progress = []
+        observed = []
+
+        def slow_download_report(download_url, out_stream, **kwargs):
+            with lock:
+                in_progress.append(download_url.rsplit("_", 1)[0])
+                observed.append(list(in_progress))
+            time.sleep(0.05)
+            with lock:
+                in_progress.remove(download_url.rsplit("_", 1)[0])
+            self.download_report(download_url, out_stream)
+
+        self.comp.client_yt.download_report.side_effect = slow_download_report
+        self.comp.client_yt.list_reports_for_jobs.return_value = (reports, {})
+        with self.assertLogs():
+            errors = self.comp.process_jobs(jobs)
+
+        self.assertEqual(errors, {})
+        self.assertEqual(self.comp.client_yt.download_report.call_count, 6)
+        self.assertEqual(max(len(downloads) for downloads in observed), 2)
+        self.assertTrue(all(len(set(downloads)) == 1 for downloads in observed))
+
+    def test_projection_of_report_type(self):
+        self.comp.conf.report_settings.report_type_settings = [
+            ReportTypeSettings("channel_basic_a3", columns=["likes"], filters=[RowFilter("date", ["20230729"])])
+        ]
+        self.comp.projections = self.comp._report_projections()
+        job = {"id": "1", "reportTypeId": "channel_basic_a3"}
+        reports = [
+            {"id": "1", "startTime": "2023-07-29T07:00:00Z", "createTime": "2023-08-01T04:00:00Z", "downloadUrl": "1"},
+            {"id": "2", "startTime": "2023-07-30T07:00:00Z", "createTime": "2023-08-01T04:00:00Z", "downloadUrl": "2"},
+        ]
+        self.process_job(job, reports)
+
+        table_path = os.path.join(self.comp.tables_out_path, "channel_basic_a3.csv")
+        with open(f"{table_path}.manifest") as manifest_file:
+            self.assertEqual([column["name"] for column in json.load(manifest_file)["schema"]], ["date", "channel_id"])
+        slices = {}
+        for file_name in os.listdir(table_path):
+            with open(os.path.join(table_path, file_name)) as slice_file:
+                slices[file_name] = slice_file.read()
+        # slices of both periods are compacted into one
+        self.assertEqual(list(slices.values()), ["20230729,abc\n"])
+
+    def test_manifest_column_types(self):
+        job = {"id": "1", "reportTypeId": "channel_basic_a3"}
+        reports = [
+            {"id": "1", "startTime": "2023-07-29T07:00:00Z", "createTime": "2023-08-01T04:00:00Z", "downloadUrl": "1"},
+        ]
+        self.process_job(job, reports)
+
+        with open(os.path.join(self.comp.tables_out_path, "channel_basic_a3.csv.manifest")) as manifest_file:
+            manifest = json.load(manifest_file)
+        self.assertEqual(
+            [
+                (column["name"], column["data_type"]["base"]["type"], column.get("primary_key", False))
+                for column in manifest["schema"]
+            ],
+            [("date", "STRING", True), ("channel_id", "STRING", True), ("views", "INTEGER", False)],
+        )
+        self.assertTrue(manifest["incremental"])
+
+    def test_parquet_output(self):
+        self.comp.conf.output_settings.format = "parquet"
+        self.comp.conf.output_settings.store_raw_files = False
+        job = {"id": "1", "reportTypeId": "channel_basic_a3"}
+        reports = [
+            {"id": "1", "startTime": "2023-07-29T07:00:00Z", "createTime": "2023-08-01T04:00:00Z", "downloadUrl": "1"},
+        ]
+        job = self.process_job(job, reports)
+
+        self.assertEqual(os.listdir(self.comp.tables_out_path), [])
+        parquet_path = os.path.join(self.comp.files_out_path, "channel_basic_a3.parquet")
+        self.assertEqual(os.listdir(parquet_path), ["2023-07-29T07_00_00Z.parquet"])
+        self.assertEqual(job["lastReportCreateTime"], "2023-08-01T04:00:00Z")
+
+    def test_projection_of_unknown_column(self):
+        self.comp.conf.report_settings.report_type_settings = [
+            ReportTypeSettings("channel_basic_a3", columns=["asset_id"])
+        ]
+        with self.assertRaisesRegex(UserException, "asset_id"):
+            self.comp._report_projections()
+
+    def test_prune_ledger(self):
+        ledger = {"2023-08-01T07:00:00Z": ["2"], "2023-01-01T07:00:00Z": ["1"], "2023-07-01T07:00:00Z": ["3"]}
+        self.assertEqual(list(Component._prune_ledger(ledger)), ["2023-07-01T07:00:00Z", "2023-08-01T07:00:00Z"])
+
+
+class TestSelectLatestReports(unittest.TestCase):
+    def test_latest_report_per_period(self):
+        reports = [
+            {"id": "3", "startTime": "2023-07-30T07:00:00Z", "createTime": "2023-08-01T04:00:00Z"},
+            {"id": "1", "startTime": "2023-07-29T07:00:00Z", "createTime": "2023-07-31T04:00:00Z"},
+            {"id": "4", "startTime": "2023-07-29T07:00:00Z", "createTime": "2023-08-02T04:00:00Z"},
+            {"id": "2", "startTime": "2023-07-30T07:00:00Z", "createTime": "2023-07-31T05:00:00Z"},
+        ]
+        selected = Component._select_latest_reports(reports)
+        self.assertEqual([report["id"] for report in selected], ["4", "3"])
+
+
 if __name__ == "__main__":
     # import sys;sys.argv = ['', 'Test.testName']
     unittest.main()
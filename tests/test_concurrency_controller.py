@@ -0,0 +1,73 @@
+import threading
+import unittest
+from unittest import mock
+
+from concurrency_controller import ConcurrencyController
+
+
+class TestConcurrencyController(unittest.TestCase):
+    def setUp(self):
+        self.now = 1000.0
+        patcher = mock.patch("time.monotonic", side_effect=lambda: self.now)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.throttling_count = 0
+
+    def controller(self, **kwargs) -> ConcurrencyController:
+        return ConcurrencyController(8, initial_limit=2, throttling_count=lambda: self.throttling_count, **kwargs)
+
+    def download(self, controller: ConcurrencyController, size: int, seconds: float = 1.0, error=None):
+        with controller.slot() as sample:
+            self.now += seconds
+            sample.bytes = size
+            sample.error = error
+
+    def test_limit_increases_while_throughput_rises(self):
+        controller = self.controller(adaptive=True)
+        for size in (100, 100, 200, 200, 200):
+            self.download(controller, size)
+        self.assertEqual(controller.limit, 4)
+
+        for _ in range(4):
+            self.download(controller, 200)
+        self.assertEqual(controller.limit, 4)
+
+    def test_limit_is_cut_on_throttling(self):
+        controller = self.controller(adaptive=True)
+        for _ in range(2):
+            self.download(controller, 100)
+        self.assertEqual(controller.limit, 3)
+
+        self.throttling_count += 1
+        for _ in range(3):
+            self.download(controller, 100)
+        self.assertEqual(controller.limit, 1)
+
+    def test_limit_is_cut_on_latency_spike(self):
+        controller = self.controller(adaptive=True)
+        for _ in range(2):
+            self.download(controller, 100)
+        for _ in range(3):
+            self.download(controller, 100, seconds=5.0)
+        self.assertEqual(controller.limit, 1)
+
+    def test_fixed_limit(self):
+        controller = self.controller()
+        for size in (100, 100, 200, 200):
+            self.download(controller, size, error=Exception())
+        self.assertEqual(controller.limit, 2)
+
+    def test_slot_waits_for_limit(self):
+        controller = ConcurrencyController(1)
+        started = threading.Event()
+
+        def download():
+            with controller.slot():
+                started.set()
+
+        with controller.slot():
+            worker = threading.Thread(target=download)
+            worker.start()
+            self.assertFalse(started.wait(0.1))
+        self.assertTrue(started.wait(1))
+        worker.join()
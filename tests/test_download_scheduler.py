@@ -0,0 +1,27 @@
+import unittest
+
+from download_scheduler import schedule_downloads
+
+DOWNLOADS = [
+    ("a", {"id": "1", "startTime": "2023-07-29T07:00:00Z", "createTime": "2023-08-03T04:00:00Z"}),
+    ("b", {"id": "2", "startTime": "2023-07-30T07:00:00Z", "createTime": "2023-08-01T04:00:00Z"}),
+    ("a", {"id": "3", "startTime": "2023-07-28T07:00:00Z", "createTime": "2023-08-02T04:00:00Z"}),
+]
+
+
+class TestScheduleDownloads(unittest.TestCase):
+    def scheduled_ids(self, priority):
+        return [report["id"] for _, report in schedule_downloads(DOWNLOADS, priority)]
+
+    def test_priorities(self):
+        self.assertEqual(self.scheduled_ids("oldest_first"), ["3", "1", "2"])
+        self.assertEqual(self.scheduled_ids("newest_first"), ["2", "1", "3"])
+        self.assertEqual(self.scheduled_ids("expiring_first"), ["2", "3", "1"])
+
+    def test_unsupported_priority(self):
+        with self.assertRaises(ValueError):
+            schedule_downloads(DOWNLOADS, "random")
+
+
+if __name__ == "__main__":
+    unittest.main()
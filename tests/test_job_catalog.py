@@ -0,0 +1,34 @@
+import unittest
+
+from job_catalog import JobCatalog
+
+JOBS = [
+    {"id": "2", "reportTypeId": "channel_basic_a3", "createTime": "2023-08-02T00:00:00Z"},
+    {"id": "1", "reportTypeId": "channel_basic_a3", "createTime": "2023-08-01T00:00:00Z"},
+    {"id": "3", "reportTypeId": "channel_cards_a1", "createTime": "2023-08-01T00:00:00Z"},
+]
+
+
+class TestJobCatalog(unittest.TestCase):
+    def test_duplicates_prefer_state_job_then_oldest(self):
+        with self.assertLogs(level="WARNING"):
+            catalog = JobCatalog(JOBS)
+
+        self.assertEqual(list(catalog.duplicates), ["channel_basic_a3"])
+        self.assertEqual(catalog.get("channel_basic_a3")["id"], "1")
+        self.assertEqual(catalog.get("channel_basic_a3", preferred_id="2")["id"], "2")
+        self.assertIsNone(catalog.get("channel_demographics_a1"))
+
+    def test_add_and_remove(self):
+        catalog = JobCatalog(JOBS[2:])
+        catalog.add({"id": "4", "reportTypeId": "channel_basic_a3"})
+        self.assertIn("channel_basic_a3", catalog)
+
+        catalog.remove("3")
+        self.assertNotIn("channel_cards_a1", catalog)
+        self.assertFalse(catalog.has_job("3"))
+        self.assertTrue(catalog.has_job("4"))
+
+
+if __name__ == "__main__":
+    unittest.main()
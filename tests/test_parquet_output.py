@@ -0,0 +1,49 @@
+import datetime
+import os
+import tempfile
+import unittest
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from parquet_output import ParquetOutput, column_types
+from report_writer import ReportWriter
+
+
+class TestParquetOutput(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.filename = os.path.join(self.tmp_dir.name, "slice.parquet")
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_column_types(self):
+        types = column_types("channel_basic_a3")
+        self.assertEqual(types["date"], pa.date32())
+        self.assertEqual(types["channel_id"], pa.string())
+        self.assertEqual(types["views"], pa.float64())
+
+    def test_rows_are_written_in_row_groups(self):
+        output = ParquetOutput(self.filename, column_types("channel_basic_a3"), row_group_bytes=20)
+        output.set_columns(["date", "channel_id", "views", "extra"])
+        output.write(b"20230801,abc,1,x\n20230802,abc,2,y\n")
+        output.write(b"20230803,,3,z")
+        output.close()
+
+        parquet_file = pq.ParquetFile(self.filename)
+        self.assertEqual(parquet_file.metadata.num_row_groups, 2)
+        table = parquet_file.read()
+        self.assertEqual(table.schema.field("extra").type, pa.string())
+        self.assertEqual(table.column("date").to_pylist()[0], datetime.date(2023, 8, 1))
+        self.assertEqual(table.column("channel_id").to_pylist(), ["abc", "abc", ""])
+        self.assertEqual(table.column("views").to_pylist(), [1.0, 2.0, 3.0])
+
+    def test_report_writer_without_rows(self):
+        with ReportWriter(self.filename, output_format="parquet", column_types=column_types("channel_basic_a3")):
+            pass
+        self.assertFalse(os.path.exists(self.filename))
+
+        with ReportWriter(self.filename, output_format="parquet") as writer:
+            writer.write(b"date,views\n")
+        self.assertEqual(pq.read_table(self.filename).num_rows, 0)
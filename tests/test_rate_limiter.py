@@ -0,0 +1,58 @@
+import unittest
+from email.utils import formatdate
+from unittest import mock
+
+from google_yt.rate_limiter import RECOVERY_INTERVAL, RateLimiter, parse_retry_after
+
+
+class TestRateLimiter(unittest.TestCase):
+    def setUp(self):
+        self.now = 1000.0
+        patcher = mock.patch("time.monotonic", side_effect=lambda: self.now)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_burst_then_rate(self):
+        limiter = RateLimiter(2)
+        self.assertEqual([limiter.reserve(), limiter.reserve()], [0.0, 0.0])
+        self.assertAlmostEqual(limiter.reserve(), 0.5)
+        self.assertAlmostEqual(limiter.reserve(), 1.0)
+
+        self.now += 1.0
+        self.assertAlmostEqual(limiter.reserve(), 0.5)
+
+    def test_large_request_is_charged_in_full(self):
+        limiter = RateLimiter(2)
+        self.assertEqual(limiter.reserve(100), 0.0)
+        self.assertAlmostEqual(limiter.reserve(), 49.5, places=2)
+        self.assertAlmostEqual(limiter.reserve(3), 50.5, places=2)
+
+    def test_slow_down_pauses_all_requests(self):
+        limiter = RateLimiter(2)
+        limiter.slow_down(retry_after=10)
+        self.assertEqual(limiter.rate, 1)
+        self.assertAlmostEqual(limiter.reserve(), 11.0)
+        self.assertAlmostEqual(limiter.reserve(), 12.0)
+
+    def test_rate_recovers(self):
+        limiter = RateLimiter(4)
+        limiter.slow_down()
+        limiter.slow_down()
+        self.assertEqual(limiter.rate, 1)
+
+        self.now += RECOVERY_INTERVAL
+        limiter.reserve()
+        self.assertEqual(limiter.rate, 2)
+
+    def test_no_limit_honors_pause(self):
+        limiter = RateLimiter(0)
+        self.assertEqual(limiter.reserve(), 0.0)
+        limiter.slow_down(retry_after=5)
+        self.assertAlmostEqual(limiter.reserve(), 5.0)
+
+    def test_parse_retry_after(self):
+        self.assertEqual(parse_retry_after("7"), 7.0)
+        self.assertIsNone(parse_retry_after(None))
+        self.assertIsNone(parse_retry_after("soon"))
+        with mock.patch("time.time", return_value=1_700_000_000):
+            self.assertAlmostEqual(parse_retry_after(formatdate(1_700_000_030, usegmt=True)), 30.0)
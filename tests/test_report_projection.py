@@ -0,0 +1,28 @@
+import unittest
+
+from report_projection import ReportProjection
+
+COLUMNS = ["date", "channel_id", "country_code", "views", "likes"]
+
+
+class TestReportProjection(unittest.TestCase):
+    def test_output_columns_keep_dimensions(self):
+        projection = ReportProjection(["date", "channel_id", "country_code"], columns=["likes"])
+        self.assertEqual(projection.output_columns(COLUMNS), ["date", "channel_id", "country_code", "likes"])
+        self.assertEqual(ReportProjection(["date"]).output_columns(COLUMNS), COLUMNS)
+
+    def test_row_filters(self):
+        projection = ReportProjection(
+            ["date", "channel_id", "country_code"],
+            filters=[("country_code", "not_in", ["CZ"]), ("channel_id", "in", ["a", "b"])],
+        )
+        rows = b'20230801,a,US,1,2\n20230801,a,CZ,3,4\n20230801,c,US,5,6\n20230801,b,"D,E",7,8\n'
+        self.assertEqual(projection.projector(COLUMNS).apply(rows), b'20230801,a,US,1,2\n20230801,b,"D,E",7,8\n')
+
+    def test_filter_on_missing_column_keeps_no_rows(self):
+        projection = ReportProjection(["date"], filters=[("asset_id", "in", ["x"])])
+        self.assertEqual(projection.projector(COLUMNS).apply(b"20230801,a,US,1,2\n"), b"")
+
+    def test_unsupported_operator(self):
+        with self.assertRaises(ValueError):
+            ReportProjection(["date"], filters=[("views", "gt", ["1"])])
@@ -0,0 +1,122 @@
+import gzip
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+import zstandard
+
+from report_projection import ReportProjection
+from report_writer import ReportWriter
+
+
+class TestReportWriter(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.slice_filename = os.path.join(self.tmp_dir.name, "slice.csv")
+        self.raw_filename = os.path.join(self.tmp_dir.name, "raw.csv")
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def _read(self, filename):
+        with open(filename, "rb") as file:
+            return file.read()
+
+    def test_header_split_across_chunks(self):
+        with ReportWriter(self.slice_filename, self.raw_filename) as writer:
+            for chunk in [b"date,chan", b"nel_id,views\n20230801,", b"abc,1\n20230802,abc,2\n"]:
+                writer.write(chunk)
+
+        self.assertEqual(writer.columns, ["date", "channel_id", "views"])
+        self.assertEqual(self._read(self.slice_filename), b"20230801,abc,1\n20230802,abc,2\n")
+        self.assertEqual(self._read(self.raw_filename), b"date,channel_id,views\n20230801,abc,1\n20230802,abc,2\n")
+
+    def test_projection_applies_to_slice_only(self):
+        report = b"date,country_code,views,likes\n20230801,US,1,2\n20230801,CZ,3,4\n20230802,US,5,6"
+        projection = ReportProjection(
+            ["date", "country_code"], columns=["likes"], filters=[("country_code", "in", ["US"])]
+        )
+        with ReportWriter(self.slice_filename, self.raw_filename, projection=projection) as writer:
+            writer.write(report[:40])
+            writer.write(report[40:])
+
+        self.assertEqual(self._read(self.slice_filename), b"20230801,US,2\n20230802,US,6\n")
+        self.assertEqual(self._read(self.raw_filename), report)
+        self.assertEqual(writer.offset, len(report))
+
+    def test_sample_of_slice_rows(self):
+        with mock.patch("report_writer.SAMPLE_BYTES", 10):
+            with ReportWriter(self.slice_filename) as writer:
+                writer.write(b"a,b\n1,2\n3,4\n5,")
+                writer.write(b"6\n")
+        self.assertEqual(writer.sample, b"1,2\n3,4\n")
+
+    def test_slices_split_on_row_boundaries(self):
+        report = b"date,views\n20230801,1\n20230802,2\n20230803,3\n20230804,4\n20230805,5"
+        with ReportWriter(self.slice_filename, self.raw_filename, max_slice_bytes=25) as writer:
+            writer.write(report[:30])
+            writer.write(report[30:])
+
+        part_filename = os.path.join(self.tmp_dir.name, "slice_part{}.csv")
+        self.assertEqual(
+            writer.slice_filenames, [self.slice_filename, part_filename.format(2), part_filename.format(3)]
+        )
+        self.assertEqual(
+            [self._read(filename) for filename in writer.slice_filenames],
+            [b"20230801,1\n20230802,2\n", b"20230803,3\n20230804,4\n", b"20230805,5"],
+        )
+        self.assertEqual(self._read(self.raw_filename), report)
+
+        with ReportWriter(self.slice_filename, max_slice_rows=3, max_slice_bytes=5) as writer:
+            writer.write(report)
+        self.assertEqual(
+            [self._read(filename) for filename in writer.slice_filenames],
+            [b"20230801,1\n", b"20230802,2\n", b"20230803,3\n", b"20230804,4\n", b"20230805,5"],
+        )
+
+        with ReportWriter(self.slice_filename, max_slice_rows=2) as writer:
+            writer.write(report)
+        self.assertEqual(
+            [self._read(filename) for filename in writer.slice_filenames],
+            [b"20230801,1\n20230802,2\n", b"20230803,3\n20230804,4\n", b"20230805,5"],
+        )
+
+    def test_header_only(self):
+        with ReportWriter(self.slice_filename) as writer:
+            writer.write(b"date,channel_id")
+
+        self.assertEqual(writer.columns, ["date", "channel_id"])
+        self.assertEqual(self._read(self.slice_filename), b"")
+        self.assertFalse(os.path.exists(self.raw_filename))
+
+    def test_interrupted_download_keeps_complete_rows(self):
+        with self.assertRaises(ConnectionError):
+            with ReportWriter(self.slice_filename) as writer:
+                writer.write(b"date,views\n20230801,1\n2023")
+                raise ConnectionError()
+
+        self.assertEqual(self._read(self.slice_filename), b"20230801,1\n")
+        self.assertEqual(writer.offset, len(b"date,views\n20230801,1\n"))
+
+        resumed_filename = self.slice_filename + "_resumed"
+        with ReportWriter(resumed_filename, start_offset=writer.offset, columns=writer.columns) as resumed:
+            resumed.write(b"20230802,2")
+
+        self.assertEqual(resumed.columns, ["date", "views"])
+        self.assertEqual(self._read(resumed_filename), b"20230802,2")
+
+    def test_compressed_outputs(self):
+        with ReportWriter(
+            self.slice_filename + ".gz", self.raw_filename + ".zst", compression="gzip", raw_compression="zstd"
+        ) as writer:
+            writer.write(b"date,views\n20230801,1\n")
+
+        with gzip.open(self.slice_filename + ".gz") as slice_file:
+            self.assertEqual(slice_file.read(), b"20230801,1\n")
+        with open(self.raw_filename + ".zst", "rb") as raw_file:
+            self.assertEqual(zstandard.ZstdDecompressor().stream_reader(raw_file).read(), b"date,views\n20230801,1\n")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,76 @@
+import gzip
+import os
+import tempfile
+import unittest
+
+from slice_compaction import compact_slices
+
+
+class TestSliceCompaction(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.folder = self.tmp_dir.name
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def _write(self, name, data, open_file=open):
+        with open_file(os.path.join(self.folder, name), "wb") as slice_file:
+            slice_file.write(data)
+
+    def _slices(self, open_file=open):
+        slices = {}
+        for name in sorted(os.listdir(self.folder)):
+            with open_file(os.path.join(self.folder, name), "rb") as slice_file:
+                slices[name] = slice_file.read()
+        return slices
+
+    def test_consecutive_small_slices_are_merged(self):
+        self._write("2023-08-01.csv", b"20230801,a,1\n")
+        self._write("2023-08-02.csv", b"20230802,a,2")
+        self._write("2023-08-03.csv", b"")
+        self._write("2023-08-04.csv", b"20230804,a,4\n" * 3)
+        self._write("2023-08-05.csv", b"20230805,a,5\n")
+        self._write("2023-08-06.csv", b"20230806,a,6\n")
+
+        self.assertEqual(compact_slices(self.folder, target_bytes=30), 3)
+        self.assertEqual(
+            self._slices(),
+            {
+                "2023-08-01.csv": b"20230801,a,1\n20230802,a,2\n",
+                "2023-08-04.csv": b"20230804,a,4\n" * 3,
+                "2023-08-05.csv": b"20230805,a,5\n20230806,a,6\n",
+            },
+        )
+
+    def test_row_limit_and_compression(self):
+        for day in range(1, 6):
+            self._write(f"2023-08-0{day}.csv.gz", f"2023080{day},a,{day}\n".encode(), gzip.open)
+
+        self.assertEqual(compact_slices(self.folder, "gzip", target_bytes=1024 * 1024, max_rows=2), 2)
+        self.assertEqual(
+            self._slices(gzip.open),
+            {
+                "2023-08-01.csv.gz": b"20230801,a,1\n20230802,a,2\n",
+                "2023-08-03.csv.gz": b"20230803,a,3\n20230804,a,4\n",
+                "2023-08-05.csv.gz": b"20230805,a,5\n",
+            },
+        )
+
+    def test_uncompressed_size_limit_of_compressed_slices(self):
+        # compressed parts of a report split by the slice size limit look small on disk
+        for part in range(1, 4):
+            self._write(f"2023-08-01_part{part}.csv.gz", b"20230801,a,1\n" * 100, gzip.open)
+        self._write("2023-08-02.csv.gz", b"20230802,a,2\n", gzip.open)
+
+        self.assertEqual(compact_slices(self.folder, "gzip", target_bytes=1024 * 1024, max_bytes=1300), 0)
+        self.assertEqual(compact_slices(self.folder, "gzip", target_bytes=1024 * 1024, max_bytes=1400), 1)
+        self.assertEqual(
+            self._slices(gzip.open)["2023-08-01_part3.csv.gz"], b"20230801,a,1\n" * 100 + b"20230802,a,2\n"
+        )
+
+    def test_no_target_keeps_slices(self):
+        self._write("2023-08-01.csv", b"20230801,a,1\n")
+        self._write("2023-08-02.csv", b"20230802,a,2\n")
+        self.assertEqual(compact_slices(self.folder), 0)
+        self.assertEqual(len(os.listdir(self.folder)), 2)